@@ -0,0 +1,188 @@
+"""
+Замеры горячих путей на сгенерированных картах. Запуск, например, из корня проекта:
+
+    python game/benchmark.py --sizes 100 1000 10000 --out bench.json
+
+Для карт-сеток, колец и случайных графов каждого размера отдельно замеряются
+сборка (Builder._build_extended), сохранение (Saver.save_extanded), полный
+каскад через модели и через ArrayEngine и RULES.reachable при BLOCK_INSULAR.
+Результаты выводятся в JSON, чтобы сравнивать прогоны на разных коммитах.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+from math import isqrt
+from time import perf_counter, time
+
+import pyglet
+pyglet.options['headless'] = True
+pyglet.options['debug_gl'] = False
+
+from core.TCGlogic.TCGBoard import Builder, GameBoardStateReaction
+from core.TCGlogic.TCGEngine import ArrayEngine
+from core.TCGlogic.TCGGame import Saver
+from core.TCGlogic.TCGHeadless import scheme, make_board
+from core.TCGlogic.TCGModel import RULES, Energy, MagicPorts
+
+
+def grid_map(size, rnd):
+    side = isqrt(size)
+    cells = [(row, col) for row in range(side) for col in range(side)]
+    links = []
+    for i, (row, col) in enumerate(cells):
+        if col + 1 < side:
+            links.append((i, i + 1, 2))
+        if row + 1 < side:
+            links.append((i, i + side, 2))
+    return scheme(cells, links)
+
+
+def ring_map(size, rnd):
+    cells = [(0, col) for col in range(size)]
+    links = [(i, (i + 1) % size, 2) for i in range(size)]
+    return scheme(cells, links)
+
+
+def random_map(size, rnd, degree=2):
+    side = isqrt(size - 1) + 1
+    cells = [divmod(i, side) for i in range(size)]
+    links = [(i, rnd.randrange(size), rnd.choice((0, 1, 2))) for i in range(size) for _ in range(degree)]
+    return scheme(cells, links)
+
+
+MAPS = {
+    'grid': grid_map,
+    'ring': ring_map,
+    'random': random_map,
+}
+
+
+def timed(func, setup=None, repeat=3):
+    """Лучшее время из repeat запусков и результат последнего"""
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = perf_counter()
+        result = func()
+        best = min(best, perf_counter() - start)
+    return best, result
+
+
+def build(data):
+    builder = Builder(data, None, MagicPorts())
+    builder.build_extended()
+    builder.complete()
+    return builder.get_product()
+
+
+def charged(board):
+    """Все клетки у P1 на грани взрыва: ход в любую клетку запускает каскад по всей доске"""
+    for cell in board.cells.values():
+        model = cell.model
+        if model.lim:
+            model.owner = Energy.P1
+            model.power = model.lim - 1
+    board.index.rebuild(board.cells.values())
+    board.rehash()
+    board.engine = None
+    return board.snapshot()
+
+
+def cascade(board, start, snapshot, engine, max_waves):
+    GameBoardStateReaction.ENGINE = engine
+    row, col = start
+
+    def run():
+        result = board.resolve(row, col, max_waves)
+        return result.waves, len(result.touched)
+    try:
+        return timed(run, lambda: board.restore(snapshot), repeat=1)
+    finally:
+        GameBoardStateReaction.ENGINE = True
+
+
+def reachable(board):
+    RULES.BLOCK_INSULAR = 1
+    models = [cell.model for cell in board.cells.values()]
+    for model in models:
+        model.owner = Energy.NEUTRAL
+        model.power = 0
+    models[0].owner = Energy.P1
+    models[0].power = 1
+    board.index.rebuild(board.cells.values())
+    board.players.next()  # после первого круга иммунитет снят
+    board.players.next()
+
+    def run():
+        return sum(1 for model in models if RULES.reachable(model, Energy.P1))
+    return timed(run, board.index.changed)
+
+
+def bench(name, size, seed, repeat, max_waves):
+    rnd = random.Random(seed)
+    data = MAPS[name](size, rnd)
+    row = {'map': name, 'cells': len(data['scheme']['cells'].split()) // 3,
+           'links': len(data['scheme']['links'].split()) // 3}
+
+    row['build'], product = timed(lambda: build(data), repeat=repeat)
+    row['save'], _ = timed(lambda: Saver(product).save_extanded(), repeat=repeat)
+    del product
+
+    board = make_board(data)
+    RULES.context(board)
+    snapshot = charged(board)
+    start = next(iter(board.cells))
+    row['cascade_objects'], (row['waves'], row['touched']) = cascade(board, start, snapshot, False, max_waves)
+    if ArrayEngine.available():
+        row['engine_setup'], _ = timed(board.reaction_engine, repeat=1)
+        row['cascade_engine'], _ = cascade(board, start, snapshot, True, max_waves)
+    row['reachable'], row['reachable_cells'] = reachable(board)
+    return row
+
+
+def meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'time': time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': ArrayEngine.available(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры горячих путей на сгенерированных картах')
+    parser.add_argument('--maps', nargs='+', default=list(MAPS), choices=MAPS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6])
+    parser.add_argument('--repeat', type=int, default=3, help='лучшее из N запусков для сборки, сохранения и reachable')
+    parser.add_argument('--max-waves', type=int, default=200, help='каскад обрывается после стольких волн')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--out', help='файл JSON, по умолчанию stdout')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for name in args.maps:
+            row = bench(name, size, args.seed, args.repeat, args.max_waves)
+            results.append(row)
+            print(json.dumps(row), file=sys.stderr)
+
+    report = {'meta': meta(), 'results': results}
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
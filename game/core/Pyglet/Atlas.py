@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+import pyglet
+from pyglet import gl
+
+
+class SlotAllocator:
+    """Номера слотов одинакового размера: выдача и возврат за O(1).
+
+    Освобождённые слоты выдаются повторно, поэтому занятая область
+    не растёт, пока число живых слотов не превышает пик.
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity  # None - без ограничения
+        self.top = 0              # слотов когда-либо выдано
+        self._free = []
+        self._released = set()
+
+    def allocate(self):
+        if self._free:
+            slot = self._free.pop()
+            self._released.discard(slot)
+            return slot
+        if self.capacity is not None and self.top >= self.capacity:
+            raise MemoryError("Свободных слотов нет")
+        slot = self.top
+        self.top += 1
+        return slot
+
+    def release(self, slot):
+        if slot in self._released or not 0 <= slot < self.top:
+            raise ValueError(f"Слот {slot} не выдан")
+        self._released.add(slot)
+        self._free.append(slot)
+
+    def clear(self):
+        self.top = 0
+        self._free.clear()
+        self._released.clear()
+
+    def __len__(self):
+        return self.top - len(self._free)
+
+
+class RenderAtlas:
+    """Общие текстуры-страницы, поделённые на слоты одного размера для отрисовки в них.
+
+    Страница - одна текстура и один Framebuffer на PAGE x PAGE пикселей,
+    новые страницы создаются по мере заполнения. Между слотами оставлен
+    зазор GAP, чтобы линейная фильтрация не захватывала соседей.
+    """
+    PAGE = 2048
+    GAP = 2
+
+    def __init__(self, width, height, page=None, pixel=False):
+        self.width = width
+        self.height = height
+        self.page = page or self.PAGE
+        self.pixel = pixel  # без сглаживания, для пиксельных картинок
+        self.columns = self.page // (width + self.GAP)
+        self.per_page = self.columns * (self.page // (height + self.GAP))
+        self.allocator = SlotAllocator()
+        self.pages = []     # (texture, framebuffer)
+
+    def allocate(self):
+        slot = self.allocator.allocate()
+        while slot // self.per_page >= len(self.pages):
+            self._add_page()
+        return slot
+
+    def release(self, slot):
+        self.allocator.release(slot)
+
+    def _add_page(self):
+        if self.pixel:
+            texture = pyglet.image.Texture.create(self.page, self.page, min_filter=gl.GL_NEAREST, mag_filter=gl.GL_NEAREST)
+        else:
+            texture = pyglet.image.Texture.create(self.page, self.page)
+        fbo = pyglet.image.Framebuffer()
+        fbo.attach_texture(texture)
+        self.pages.append((texture, fbo))
+
+    def origin(self, slot):
+        """Номер страницы и левый нижний угол слота в ней"""
+        page, index = divmod(slot, self.per_page)
+        row, col = divmod(index, self.columns)
+        return page, col * (self.width + self.GAP), row * (self.height + self.GAP)
+
+    def upload(self, slot, image):
+        """Записать картинку в слот без отрисовки, картинка должна помещаться в слот"""
+        page, x, y = self.origin(slot)
+        self.pages[page][0].blit_into(image, x, y, 0)
+
+    @contextmanager
+    def target_page(self, page):
+        """Рисовать во всю страницу сразу: область вывода - вся страница, без очистки"""
+        fbo = self.pages[page][1]
+        viewport = (gl.GLint * 4)()
+        gl.glGetIntegerv(gl.GL_VIEWPORT, viewport)
+
+        fbo.bind()
+        gl.glViewport(0, 0, self.page, self.page)
+        try:
+            yield
+        finally:
+            fbo.unbind()
+            gl.glViewport(*viewport)
+
+    def __len__(self):
+        return len(self.allocator)
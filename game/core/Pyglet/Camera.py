@@ -1,7 +1,10 @@
 import pyglet
-from pyglet.math import Mat4
+from pyglet.math import Mat4, Vec4
 
 class Camera:
+    MIN_ZOOM = 1
+    MAX_ZOOM = 4
+    
     def __init__(self, window, x=0, y=0, zoom=1.0):
         self._window = window
         self._x = x
@@ -65,7 +68,7 @@ class Camera:
             # Сохраняем мировые координаты точки фокуса
             world_x, world_y = self.screen_to_world(focus_x, focus_y)
         
-        self._zoom = max(1, min(4, zoom))  # Ограничиваем зум
+        self._zoom = max(self.MIN_ZOOM, min(self.MAX_ZOOM, zoom))  # Ограничиваем зум
         
         if focus_x is not None and focus_y is not None:
             # Возвращаем точку фокуса в те же экранные координаты
@@ -90,6 +93,13 @@ class Camera:
         self._y = y
         self.update_projection()
 
+    def bounds(self):
+        """Видимая область в мировых координатах: left, bottom, right, top"""
+        inverse = ~self.current_projection
+        left, bottom = (inverse @ Vec4(-1, -1, 0, 1))[:2]
+        right, top = (inverse @ Vec4(1, 1, 0, 1))[:2]
+        return left, bottom, right, top
+
     def screen_to_world(self, screen_x, screen_y):
         """Преобразовать экранные координаты в мировые"""
         width, height = self._window.size
@@ -130,4 +140,8 @@ class ControllableCamera(Camera):
         if scroll_y < 0:
             self.zoom_out(1.1, x, y)
         elif scroll_y > 0:
-            self.zoom_in(1.1, x, y)
\ No newline at end of file
+            self.zoom_in(1.1, x, y)
+
+class BoardCamera(ControllableCamera):
+    # Доска на мелком масштабе рисуется текстурами чанков, отдалять можно дальше
+    MIN_ZOOM = 1 / 16
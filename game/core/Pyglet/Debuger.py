@@ -2,10 +2,14 @@ import pyglet
 from pyglet.window.key import KeyStateHandler, symbol_string
 from pyglet.window.mouse import MouseStateHandler, buttons_string
 from pyglet.window import FPSDisplay
+from pyglet.window.key import F9
 from time import time
+from ..Timings import TIMINGS
 
 class Debuger:
     PAD = 30
+    TIMINGS_PERIOD = 0.5  # как часто пересчитывать p50/p99 в оверлее
+    DUMP_KEY = F9
 
     def __init__(self, window, batch=None):
         self.active = True
@@ -15,6 +19,9 @@ class Debuger:
         self.fps = FPSDisplay(window)
         window.push_handlers(self.key, self.mouse, self)
         self.run_time = time()
+        self.timings = ''
+        self.timings_time = 0
+        self.dumped = ''  # куда F9 сохранил замеры в последний раз
 
         self.batch = batch or pyglet.graphics.Batch()
         self.lable = pyglet.text.Label('', self.PAD, self.window.height - self.PAD,
@@ -30,7 +37,12 @@ class Debuger:
             return
         self.batch.draw()
 
+    def on_key_press(self, symbol, modifiers):
+        if symbol == self.DUMP_KEY:
+            self.dumped = TIMINGS.dump(f'timings_{int(time())}.json')
+
     def on_update(self, dt):
+        TIMINGS.add('frame', dt)
         if not self.active:
             return
         run = time()-self.run_time
@@ -46,6 +58,11 @@ class Debuger:
         mk = str([buttons_string(key) for key, pressed in mouse.items() if key not in list('xy') and pressed])[1:-1]
         kk = str([symbol_string(key) for key, pressed in self.key.data.items() if pressed])[1:-1]
 
-        self.lable.text = f'FPS: {fps}\nRun time: {time_str}\nMouse: x={x} y={y} buttons={{{mk}}}\nKeys: {{{kk}}}\n' + self.window.debug()
+        if time() - self.timings_time > self.TIMINGS_PERIOD:
+            self.timings = TIMINGS.overlay()
+            self.timings_time = time()
+
+        self.lable.text = f'FPS: {fps}\nRun time: {time_str}\nMouse: x={x} y={y} buttons={{{mk}}}\nKeys: {{{kk}}}\n' + self.window.debug() + \
+                          f'\nTimings (F9 - dump{" -> " + self.dumped if self.dumped else ""}):\n{self.timings}'
 
     
\ No newline at end of file
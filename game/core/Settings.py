@@ -3,7 +3,8 @@ from pathlib import Path
 
 ASSET_DIR = Path(__file__).parent.parent.resolve() / "src"
 
-PATH = '././settings/settings.cfg'
+# Как и ASSET_DIR, от пакета, а не от текущего каталога
+PATH = Path(__file__).parent.parent.parent.resolve() / "settings" / "settings.cfg"
 
 class Settings:
     _instance = None
@@ -1,13 +1,18 @@
-from .TCGCell import Cell, get_color, Energy, TILE_SIZE, get_side, TYPE_CELL, RULES
+from .TCGCell import (Cell, get_color, Energy, TILE_SIZE, get_side, TYPE_CELL, RULES, MagicPorts, ModelCell,
+                      create_model, cell_zobrist, board_renderer)
+from .TCGGame import PlayersNode, Players, Modes, GameStateAttribute, Saver, Snapshot, Replay, read_scheme, map_hash
+from .TCGEngine import ArrayEngine
+from .TCGIndex import TerritoryIndex
 import pyglet
 from ..Settings import Settings, ASSET_DIR
-from random import shuffle
+from ..Timings import TIMINGS
 from enum import Enum, auto
 from typing import Literal
 from pyglet.math import Vec2
 from time import time
-from itertools import cycle
-from math import pi
+from itertools import cycle, chain
+from functools import reduce
+from operator import xor
 
 
 settings = Settings()
@@ -16,319 +21,67 @@ settings.load()
 class SoundEffects:
     SoundName = Literal['reaction', 'click', 'warn', 'start', 'game_over']
     
-    sounds = {
-        'reaction': pyglet.media.load(ASSET_DIR / 'sounds/boom.wav', streaming=False),
-        'click': pyglet.media.load(ASSET_DIR / 'sounds/button.wav', streaming=False),
-        'warn': pyglet.media.load(ASSET_DIR / 'sounds/error.wav', streaming=False),
-        'start': pyglet.media.load(ASSET_DIR / 'sounds/start.wav', streaming=False),
-        'game_over': pyglet.media.load(ASSET_DIR / 'sounds/win.wav', streaming=False)
+    files = {
+        'reaction': 'sounds/boom.wav',
+        'click': 'sounds/button.wav',
+        'warn': 'sounds/error.wav',
+        'start': 'sounds/start.wav',
+        'game_over': 'sounds/win.wav'
     }
+    sounds = dict()  # загружаются при первом воспроизведении
     
     sound_enabled = settings.sound_effects
     
     @classmethod
     def play(cls, sound_name: SoundName):
         """Воспроизвести звук по имени"""
-        if settings.sound_effects and sound_name in cls.sounds:
-            cls.sounds[sound_name].play()
+        if settings.sound_effects and sound_name in cls.files:
+            sound = cls.sounds.get(sound_name)
+            if sound is None:
+                sound = cls.sounds[sound_name] = pyglet.media.load(ASSET_DIR / cls.files[sound_name], streaming=False)
+            sound.play()
     
 
-class PlayersNode:
-    value: Energy
-    next: 'PlayersNode'
-    immunity: int
-    def __init__(self, player):
-        self.value = player
-        self.next = None
-        self.immunity = 1
-        
-class Players:
-    SHUFFLE = False
-    def __init__(self, players=None):
-        
-        self.players = players or list()
-        self.ptr = None
-    
-    def join(self, *args):
-        self.players.extend(args)
-
-    def leave(self, *args):
-        for p in args:
-            self.players.remove(p)
-    
-    def restart(self):
-        if len(self.players) < 2:
-            raise ValueError("Игроков должно быть минимум 2")
-        
-        queue = self.players.copy()
-        if self.SHUFFLE:
-            shuffle(queue)
-        
-        self.length = len(queue)
-        head = PlayersNode(queue.pop(0))
-        prev = head
-        while queue:
-            current = PlayersNode(queue.pop(0))
-            prev.next = current
-            prev = current
-        prev.next = head
-        
-        self.ptr = head
-        
-
-    def next(self):
-        
-        self.ptr.immunity = 0
-        self.ptr = self.ptr.next
-
-    def current(self):
-        return self.ptr.value if self.ptr is not None else Energy.NEUTRAL
-    
-    def queue(self):
-        lst = []
-        
-        head = self.ptr
-        prev = head
-        current = head.next
-        
-        while True:
-            lst.append(current.value)
-            prev = current
-            current = current.next
-            if current is head.next:
-                lst.insert(0, lst.pop())
-                return lst
-        
-    
-    def kick(self, player, forced=False):
-        if self.length < 2:
-            return
-        
-        head = self.ptr
-        prev = head
-        current = head.next
-
-        while current.value != player:
-            prev = current
-            current = current.next
-            if current is head.next:  # Элемент не найден
-                return
-        if current.immunity and not forced:
-            return
-        prev.next = current.next
-        if current is head:
-            self.ptr = head.next
-        self.length -= 1
-                
-    def has_winner(self):
-        return self.length < 2
-    
-    def winner(self):
-        return self.ptr.value
-    
-    def __repr__(self):
-        return str(self.queue())
-
-class Modes(Enum):
-    OLD = auto()
-    CLASSIC = auto()
-    EXTENDED = auto()
-    RECHARGED = auto()
-    DOUBLING = auto()
-    HIDDEN = auto()
-    
-    
-class GameStateAttribute(Enum):
-    DEFAULT = auto()
-    READY = auto()
-    WATING = auto()
-    REACTION = auto()
-    FINISH = auto()
-    EDIT = auto()
-    BUILD = auto()
-    
-class Saver:
-    def __init__(self, cells):
-        self.cells = cells
-        
-    def save_classic(self):
-        cell_buffer = []
-        cells = []
-        links = []
-        index = 0
-        for pos, cell in self.cells.items():
-            cell.model.mark = index
-            cell_buffer.append(cell.model)
-            row, col = pos
-            cells.append(f'{row} {col}')
-            index += 1
-        index = 0
-        for c in cell_buffer:
-            out = {i.mark for i in c.outgoing_links}
-            in_ = {i.mark for i in c.incoming_links}
-            two = out & in_
-            out -= two
-            in_ -= two
-            
-            for ol in out:
-                if ol < index:
-                    continue
-                links.append(f'{index} {ol} 0')
-            for il in in_:
-                if il< index:
-                    continue
-                links.append(f'{index} {il} 1')
-            for tl in two:
-                if tl < index:
-                    continue
-                links.append(f'{index} {tl} 2')
-            index += 1
-        
-        
-        
-        return  {
-    "meta": {
-        "version": "0.0.2",
-        "name": "",
-        "creation_time": time(),
-        "description": "",
-        "author": None,
-        "modes": [Modes.CLASSIC.value],
-        "property": None
-    },
-    "scheme": {
-        "scanfmt": "ROW COL \\ CI0 CI1 TL",
-        "cells": ' '.join(cells),
-        "links": ' '.join(links)
-    }
-}
-    @staticmethod
-    def sort_cells(center=(0,0)):
-        center = Vec2(*center) * TILE_SIZE + TILE_SIZE / 2
-        def calc(cell: Cell):
-            nonlocal center
-            y, x = cell[0]
-            dist = (x* TILE_SIZE+ TILE_SIZE / 2, y* TILE_SIZE+ TILE_SIZE / 2) - center
-
-            return dist.length_squared(), dist.heading() + pi
-        return calc
-    
-    @staticmethod
-    def calc_center(cells):
-        minx, miny, \
-        maxx, maxy = float('inf'), float('inf'), -float('inf'), -float('inf')
-        for pos, cell in cells:
-            y, x = pos
-
-            minx = min(minx, x)
-            maxx = max(maxx, x)
-            miny = min(miny, y)
-            maxy = max(maxy, y)
-        return Vec2(maxx + minx , maxy + miny) / 2
-
-    def save_extanded(self):
-        cell_buffer2 = list(self.cells.items())
-        center = self.calc_center(cell_buffer2)
-        calc = self.sort_cells(center)
-        from math import floor, ceil
-        dcol, drow = map(floor, center)
-
-        cell_buffer2.sort(key=calc)
-
-        cells = []
-        links = []
-        index = 0
-
-        cell_buffer = []
-
-        for pos, cell in cell_buffer2:
-            cell.model.mark = index
-            cell_buffer.append(cell.model)
-            row, col = pos
-            cells.append(f'{row - drow} {col-dcol} {TYPE_CELL.index(type(cell))}')
-            index += 1
-        index = 0
-        for c in cell_buffer:
-            out = {i.mark for i in c.outgoing_links}
-            in_ = {i.mark for i in c.incoming_links}
-            two = out & in_
-            out -= two
-            in_ -= two
-            
-            for ol in out:
-                if ol < index:
-                    continue
-                links.append(f'{index} {ol} 0')
-            for il in in_:
-                if il< index:
-                    continue
-                links.append(f'{index} {il} 1')
-            for tl in two:
-                if tl < index:
-                    continue
-                links.append(f'{index} {tl} 2')
-            index += 1
-        
-        
-        
-        return  {
-    "meta": {
-        "version": "0.0.2",
-        "name": "",
-        "creation_time": time(),
-        "description": "",
-        "author": None,
-        "modes": [Modes.EXTENDED.value],
-        "property": None
-    },
-    "scheme": {
-        "scanfmt": "ROW COL TC\\ CI0 CI1 TL",
-        "cells": ' '.join(cells),
-        "links": ' '.join(links)
-    }
-}
-        
 from .TCGtools import link_cell
 class Builder:
-    def __init__(self, scheme, batch):
+    """Пошаговая сборка доски. Без batch собираются клетки без видов"""
+    def __init__(self, scheme, batch, ports=None):
         self.scheme = scheme
         self.batch = batch
+        self.ports = MagicPorts() if ports is None else ports
         self.build_task = None
         self.product = dict()
         self.tick  = 0
     
+    @property
+    def render(self):
+        return self.batch is not None
+    
     def get_product(self):
         return self.product
     
+    def create(self, tc, position):
+        if not self.render:
+            return ModelCell(create_model(tc, position, self.ports))
+        return TYPE_CELL[tc](position, self.batch, ports=self.ports)
+    
     def build_classic(self):
         self.build_task = self._build_classic()
     
     def _build_classic(self):
         cells_d = dict()
-        scheme = self.scheme.get("scheme")
-        scanfmt: str = scheme.get("scanfmt")
-        cells = iter(scheme.get("cells").split())
-        links = iter(scheme.get("links").split())
-        cellf, linkf = scanfmt.lower().split('\\')
-        cellf = cellf.split()
-        linkf = linkf.split()
+        cells, links = read_scheme(self.scheme)
         
         cell_buffer = []
         
         
-        for args in zip(*([cells]*len(cellf))):
-            d = self._read_scan_str(cellf, args)
-            row, col = int(d.get('row')), int(d.get('col'))
-            cell = Cell((row, col), self.batch)
+        for row, col, tc in cells:
+            cell = self.create(0, (row, col))
             cell_buffer.append(cell)
-            cell.view.render_sides()
-            cell.view.render_sensor()
-            cell.view.update()
+            cell.render()
             yield
             
-        for args in zip(*([links]*len(linkf))):
-            d = self._read_scan_str(linkf, args)
-            c1, c2, tl = int(d.get('ci0')), int(d.get('ci1')), int(d.get('tl'))
+        for c1, c2, tl in links:
             a, b = cell_buffer[c1], cell_buffer[c2]
             link_cell(a, b, type=tl)
 
@@ -336,9 +89,7 @@ class Builder:
           
         for cell in cell_buffer:
             cell: Cell
-            cell.view.render_sides()
-            cell.view.render_sensor()
-            cell.view.update()
+            cell.render()
             cells_d[cell.model.position] = cell
             yield
 
@@ -349,30 +100,20 @@ class Builder:
         
     def _build_extended(self):
         cells_d = dict()
-        scheme = self.scheme.get("scheme")
-        scanfmt: str = scheme.get("scanfmt")
-        cells = iter(scheme.get("cells").split())
-        links = iter(scheme.get("links").split())
-        cellf, linkf = scanfmt.lower().split('\\')
-        cellf = cellf.split()
-        linkf = linkf.split()
+        cells, links = read_scheme(self.scheme)
         
         cell_buffer = []
         
         
-        for args in zip(*([cells]*len(cellf))):
-            d = self._read_scan_str(cellf, args)
-            row, col, tc = int(d.get('row')), int(d.get('col')), int(d.get('tc', 0))
-            cell = TYPE_CELL[tc]((row, col), self.batch)
+        for row, col, tc in cells:
+            cell = self.create(tc, (row, col))
             cell_buffer.append(cell)
             #cell.view.render_sides()
             #cell.view.render_sensor()
             #cell.view.update()
             yield
             
-        for args in zip(*([links]*len(linkf))):
-            d = self._read_scan_str(linkf, args)
-            c1, c2, tl = int(d.get('ci0')), int(d.get('ci1')), int(d.get('tl'))
+        for c1, c2, tl in links:
             a, b = cell_buffer[c1], cell_buffer[c2]
             link_cell(a, b, type=tl)
             #a.view.render_sides()
@@ -385,18 +126,12 @@ class Builder:
           
         for cell in cell_buffer:
             cell: Cell
-            cell.view.render_sides()
-            cell.view.render_sensor()
-            cell.view.update()
+            cell.render()
             cells_d[cell.model.position] = cell
             yield
 
         self.product = cells_d
         
-    @staticmethod
-    def _read_scan_str(fmt, args):
-        return dict(zip(fmt, args))
-    
     def build_old(self):
         self.build_task = self._build_old()
     
@@ -408,7 +143,7 @@ class Builder:
             position = tuple(map(int, position))
             if position in cells:
                 continue
-            cell = Cell(position, self.batch)
+            cell = self.create(0, position)
             cells[position] = cell
             yield
         
@@ -424,9 +159,7 @@ class Builder:
         
         for cell in cells.values():
             cell: Cell
-            cell.view.render_sides()
-            cell.view.render_sensor()
-            cell.view.update()
+            cell.render()
             yield
         
         self.product = cells
@@ -443,9 +176,11 @@ class Builder:
         for cell in cells.values():
             cell: Cell
             cell.model.power = max(0, randint(0, cell.model.lim_power()-1))
-            cell.view.update()
+            if cell.view is not None:
+                cell.view.update()
             yield
     
+    @TIMINGS.timed('build')
     def build(self, work_time):
         now = time()
         self.tick += 1
@@ -459,6 +194,12 @@ class Builder:
                 next(self.build_task)
             except StopIteration:
                 return True
+    
+    def complete(self):
+        """Дособрать доску за один вызов"""
+        for _ in self.build_task:
+            pass
+        return True
         
     
 class Particle:
@@ -536,13 +277,18 @@ class GameBoardState:
     def check(self):
         return
     
-    def switch_state(self, state):
-        self.master.state = state(self.master)
+    def switch_state(self, state, *args):
+        self.master.state = state(self.master, *args)
 
     def kick(self, player):
         return
     
     def draw(self):
+        camera = self.master.camera
+        if camera is None:
+            self.master.renderer.draw()
+        else:
+            self.master.renderer.draw(camera.bounds(), camera.zoom)
         self.master.batch.draw()
     
     def update(self, dt):
@@ -553,17 +299,28 @@ class GameBoardStateBuild(GameBoardState):
         return GameStateAttribute.BUILD
     
     def update(self, dt):
-        if not self.master.builder.build(1/120):
-            return
-        
-        self.master.cells = self.master.builder.get_product()
+        if self.master.builder.build(1/120):
+            self.finish()
+    
+    def complete(self):
+        self.master.builder.complete()
+        self.finish()
+    
+    def finish(self):
+        builder = self.master.builder
+        self.master.cells = builder.get_product()
+        self.master.reindex()
+        self.master.engine = None
+        self.master.rehash()
         
         try:
             self.master.players.restart()
+            self.master.replay = Replay(self.master.map_hash, self.master.players.queue()) if self.master.RECORD else None
             self.switch_state(GameBoardStateWating)
         except:
             self.switch_state(GameBoardStateReady)
-        SoundEffects.play('start')
+        if builder.render:
+            SoundEffects.play('start')
     
     def draw(self):
        # return
@@ -579,12 +336,9 @@ class GameBoardStateWating(GameBoardState):
         if not cell:
             return
         cell = self.master.cells[(row, col)]
-        if cell.model.hit(owner=self.master.players.current()):
-            cell.model.charge(self.master.players.current())
-            cell.model.fill()
+        if self.move(cell):
             cell.view.update()
             SoundEffects.play('click')
-            self.switch_state(GameBoardStateReaction)
             if cell.model.is_full() and settings.chain_reaction:
                 SoundEffects.play('reaction')
             else:
@@ -593,18 +347,53 @@ class GameBoardStateWating(GameBoardState):
             
         else:
             self.master.warn()
+    
+    def move(self, cell, render=True):
+        """Ход текущего игрока, возвращает состояние начавшейся реакции"""
+        player = self.master.players.current()
+        if not cell.model.hit(owner=player):
+            return
+        replay = self.master.replay
+        if replay is not None:
+            if replay.due():
+                replay.keyframes[len(replay)] = self.master.snapshot()
+            replay.record(cell.model.position)
+        before = [(model, model.owner_id, model.power) for model in cell.model.group()]
+        cell.model.charge(player)
+        cell.model.fill()
+        for model, owner_id, power in before:
+            self.master.zobrist ^= cell_zobrist(model.position, owner_id, power) ^ \
+                                   cell_zobrist(model.position, model.owner_id, model.power)
+        # Полные клетки, оставшиеся после зациклившейся реакции, реагируют вместе с ходом
+        # Клетки, удалённые после зацикливания, уже не в индексе
+        frontier = [cell, *(c for c in self.master.unstable if c.model.index is not None)]
+        self.master.unstable = []
+        self.switch_state(GameBoardStateReaction, frontier, render)
+        return self.master.state
         
 class GameBoardStateReaction(GameBoardState):
     DELAY = 0.5
+    ENGINE = True
     
-    def __init__(self, master):
+    def __init__(self, master, frontier=None, render=True):
         super().__init__(master)
         
+        self.engine = master.reaction_engine(frontier) if self.ENGINE else None
+        master.index.defer()
+        if self.engine is None:
+            cells = self.cells() if frontier is None else frontier
+            self.frontier = self.expand(cell.model for cell in cells)
+        self.render = render  # без отрисовки виды, частицы и звуки не трогаются
         self.time = 0
         self.combo = 1
+        self.waves = 0
+        self.touched = set(frontier or ())
+        self.state_hash = 0   # XOR ключей клеток, изменившихся с начала реакции
+        self.seen = dict()
+        self.cycle = None
         self.batch = pyglet.graphics.Batch()
         self.particles = ParticleManager()
-        if settings.chain_reaction:
+        if settings.chain_reaction and render:
             self.particle_add()
             
 
@@ -613,7 +402,7 @@ class GameBoardStateReaction(GameBoardState):
 
     def check_pat(self):
         pl = self.master.players.current()
-        if any((cell.model.hit(owner=pl) for cell in self.cells())):
+        if self.master.index.has_move(pl):
             return
         self.master.players.kick(pl, True)
         if self.master.players.has_winner():
@@ -621,9 +410,26 @@ class GameBoardStateReaction(GameBoardState):
             return True
         self.check_pat()
     
+    def expand(self, models):
+        """Клетки доски для набора моделей, порты магических клеток берутся целиком"""
+        cells = self.master.cells
+        result = dict()
+        for model in models:
+            if model in result:
+                continue
+            for m in model.group():
+                cell = cells.get(m.position)
+                if cell is not None and cell.model is m:
+                    result[m] = cell
+        return result
+    
+    def full_cells(self):
+        if self.engine is not None:
+            return self.engine.full_cells()
+        return [cell for cell in self.frontier.values() if cell.model.is_full()]
+    
     def particle_add(self):
-        full = filter(lambda cell : cell.model.is_full(), self.cells())
-        for fc in full:
+        for fc in self.full_cells():
             fc: Cell
             row, col = fc.model.position
             start = (col * TILE_SIZE + TILE_SIZE / 2,
@@ -642,48 +448,152 @@ class GameBoardStateReaction(GameBoardState):
         super().draw()
         self.batch.draw()
     
-    def update(self, dt):
-        self.time += dt
-        if not settings.chain_reaction or (self.time >= self.DELAY):
-            self.particles.clear()
-            for cell in self.cells():
-                cell: Cell
-                cell.model.reaction()
+    @staticmethod
+    def cell_key(model, owner_id, power):
+        return cell_zobrist(model.position, owner_id, power)
+    
+    def frontier_key(self):
+        if self.engine is not None:
+            return self.engine.frontier_key()
+        return reduce(xor, (hash(model.position) for model in self.frontier), 0)
+    
+    def looped(self):
+        """Повторилось ли состояние доски вместе с фронтом, длина цикла - в self.cycle"""
+        key = self.state_hash, self.frontier_key(), self.master.players.length
+        wave = self.seen.setdefault(key, self.waves)
+        if wave != self.waves:
+            self.cycle = self.waves - wave
+            return True
+        return False
+    
+    def wave(self):
+        if self.engine is not None:
+            f_full, changed, key = self.engine.step()
+            # Без отрисовки модели получают состояние движка только в конце хода
+            changed = self.engine.flush(changed) if self.render else ()
+        else:
+            f_full, changed, before = self.object_wave()
+            key = 0
+            for cell, (owner_id, power) in zip(changed, before):
+                model = cell.model
+                key ^= self.cell_key(model, owner_id, power) ^ self.cell_key(model, model.owner_id, model.power)
+        self.waves += 1
+        self.touched.update(changed)
+        self.state_hash ^= key
+        self.master.zobrist ^= key
+        if self.render:
+            with TIMINGS.measure('cells.update'):
+                for cell in changed:
+                    cell.view.update()
+        
+        index = self.master.index
+        lose = {player for player in self.master.players.queue() if not index.alive(player)}
+        return f_full, lose
+    
+    def object_wave(self):
+        frontier = self.frontier
+        before = {model: (model.owner_id, model.power) for model in frontier}
+        for model in frontier:
+            model.reaction()
+        # Заряженные волной; input_owner_id тени порта может остаться с прошлой волны
+        charged = {out for model in frontier for out in model.outgoing_links if out.input_power}
+        touched = self.expand(chain(frontier, charged))
+        for model in touched:
+            if model not in frontier:
+                # Клетка не полная, но магический порт должен отметить реакцию
+                before[model] = (model.owner_id, model.power)
+                model.reaction()
+        
+        for model in touched:
+            model.fill()
+        changed = [model for model in touched if before[model] != (model.owner_id, model.power)]
+        
+        full = [model for model in touched if model.is_full()]
+        self.frontier = self.expand(chain(full, charged))
+        return bool(full), [touched[model] for model in changed], [before[model] for model in changed]
+    
+    def flush(self):
+        """Записать в модели состояние движка, накопленное волнами"""
+        if self.engine is not None:
+            self.touched.update(self.engine.flush())
+    
+    def game_over(self):
+        if self.render:
+            return super().game_over()
+        self.switch_state(GameBoardStateFinish)
+    
+    def step(self):
+        """Одна волна реакции, возвращает True, если реакция закончилась"""
+        self.particles.clear()
+        f_full, lose = self.wave()
+        for loser in lose:
+            self.master.players.kick(loser)
+        if self.master.players.has_winner():
+            self.flush()
+            self.master.index.settle()
+            self.game_over()
+            return True
+        if f_full and self.looped():
+            # Реакция зациклилась: ход заканчивается на текущем состоянии
+            self.master.unstable = self.full_cells()
             f_full = False
-            lose = set(self.master.players.queue())
-            for cell in self.cells():
-                cell: Cell
-                cell.model.fill()
-                cell.view.update()
-                f_full = f_full or cell.model.is_full()
-                if cell.model.is_considered():
-                    lose.discard(cell.model.owner)
-            for loser in lose:
-                self.master.players.kick(loser)
+        if f_full:
+            self.combo += 1
+            if settings.chain_reaction and self.render:
+                self.particle_add()
+                SoundEffects.play('reaction')
+            self.time = 0
+            return False
+        
+        self.flush()
+        self.master.index.settle()
+        prev = self.master.players.current()
+        self.master.players.next()
+        if prev in lose:
+            # Иммунитет первого круга снят только что, ходивший проигравший выбывает
+            self.master.players.kick(prev)
             if self.master.players.has_winner():
                 self.game_over()
-                return
-            if f_full:
-                self.combo += 1
-                if settings.chain_reaction:
-                    self.particle_add()
-                    SoundEffects.play('reaction')
-                self.time = 0
-            else:
-                prev = self.master.players.current()
-                self.master.players.next()
-                if prev in lose:
-                    self.master.players.kick(loser)
-                if self.check_pat():
-                    return
-                if RULES.HIDE_MODE or RULES.BLOCK_INSULAR:
-                    for cell in self.cells():
-                        cell.view.update()
-                self.switch_state(GameBoardStateWating)
+                return True
+        if self.check_pat():
+            return True
+        if self.render and (RULES.HIDE_MODE or RULES.BLOCK_INSULAR):
+            self.master.refresh_fog()
+        self.switch_state(GameBoardStateWating)
+        return True
+    
+    def resolve(self, max_waves=None):
+        """Досчитать реакцию без ожидания кадров"""
+        done = False
+        while not done and (max_waves is None or self.waves < max_waves):
+            done = self.step()
+        self.flush()
+        return Resolution(self.master.phase(), self.waves, self.touched, self.cycle)
+    
+    def update(self, dt):
+        self.time += dt
+        if not settings.chain_reaction or (self.time >= self.DELAY):
+            self.step()
         else:
             progress = self.time / self.DELAY
             self.particles.progress(progress)
     
+class Resolution:
+    """Итог хода, досчитанного до затухания реакции или конца игры"""
+    phase: GameStateAttribute
+    waves: int
+    touched: set
+    cycle: int  # длина цикла, если реакция зациклилась
+    
+    def __init__(self, phase, waves, touched, cycle=None):
+        self.phase = phase
+        self.waves = waves
+        self.touched = touched
+        self.cycle = cycle
+    
+    def __repr__(self):
+        return f'<Resolution phase={self.phase.name} waves={self.waves} touched={len(self.touched)} cycle={self.cycle}>'
+    
 class GameBoardStateFinish(GameBoardState):
     def phase(self):
         return GameStateAttribute.FINISH
@@ -703,12 +613,18 @@ class GameBoardStateEdit(GameBoardState):
         super().__init__(master)
 
         self._editor = Editor(self)
+        self.master.engine = None
+        self.master.unstable = []  # после правки зацикленная реакция не продолжается
 
     def phase(self):
         return GameStateAttribute.EDIT
     
     def update(self, dt):
         self._editor.update(dt)
+    
+    def finish(self):
+        self.master.edited()
+        self.switch_state(GameBoardStateWating)
 
 class GameBoardStateReady(GameBoardState):
 
@@ -716,6 +632,8 @@ class GameBoardStateReady(GameBoardState):
         return GameStateAttribute.READY
     
 class GameBoard:
+    RECORD = True  # записывать партии в self.replay
+    
     def __init__(self, scene):
         RULES.context(self)
         self.scene = scene
@@ -724,6 +642,16 @@ class GameBoard:
         self.state = GameBoardState(self)
         self.players = Players()
         self.this = None
+        self.engine = None
+        self.index = TerritoryIndex()
+        self.ports = MagicPorts()
+        self.unstable = []  # полные клетки, оставленные зациклившейся реакцией
+        self.zobrist = 0    # XOR ключей Зобриста состояний клеток
+        self.builder = None
+        self.map_hash = None
+        self.replay = None
+        self._seek = None   # (запись, ход, ключ позиции) после последней перемотки
+        self._layout = None
     
     def join(self, *players):
         self.players.join(*players)
@@ -731,8 +659,25 @@ class GameBoard:
     def leave(self, *players):
         self.players.leave(*players)
     
-    def build(self, scheme):
-        self.builder = Builder(scheme, self.batch)
+    @property
+    def renderer(self):
+        """Общий отрисовщик видов клеток доски"""
+        return board_renderer(self.batch)
+    
+    @property
+    def camera(self):
+        """Камера сцены, по ней отсекаются и упрощаются невидимые части доски"""
+        return getattr(self.scene, 'camera', None)
+    
+    @property
+    def rendered(self):
+        """Есть ли у клеток доски виды"""
+        return self.builder is None or self.builder.render
+    
+    def build(self, scheme, render=True):
+        """Без render доска собирается из клеток без видов и считается только через resolve()"""
+        self.builder = Builder(scheme, self.batch if render else None, self.ports)
+        self.map_hash = map_hash(scheme)
     
     def save(self, mod=Modes.EXTENDED):
         match mod:
@@ -749,6 +694,11 @@ class GameBoard:
             cell:Cell
             cell.delete()
         self.cells.clear()
+        self.index.clear()
+        self.ports.clear()
+        self.unstable = []
+        self.engine = None
+        self.zobrist = 0
         
         match mod:
             case Modes.CLASSIC:
@@ -763,8 +713,155 @@ class GameBoard:
                 raise ValueError("Неизвестный режим игры")
         self.state = GameBoardStateBuild(self)        
         
+    def reaction_engine(self, frontier=None):
+        if not ArrayEngine.available():
+            return
+        if self.engine is None:
+            self.engine = ArrayEngine(self.cells.values(), self.index)
+            if frontier is not None:
+                self.engine.sync()
+        self.engine.sync(frontier)
+        return self.engine
+    
+    def resolve(self, row, col, max_waves=None, render=False):
+        """Сделать ход и досчитать цепную реакцию за один вызов.
+
+        Без render виды клеток не обновляются, это остаётся вызывающему.
+        Возвращает Resolution или None, если ход невозможен.
+        """
+        if self.phase() != GameStateAttribute.WATING:
+            return
+        cell = self.cells.get((row, col))
+        if cell is None:
+            return
+        reaction = self.state.move(cell, render)
+        if reaction is None:
+            return
+        return reaction.resolve(max_waves)
+    
+    def layout(self):
+        """Клетки доски в порядке снимков, один кортеж на всё время жизни топологии"""
+        if self._layout is None or self._layout[0] != self.index.topology:
+            self._layout = self.index.topology, tuple(self.cells.values())
+        return self._layout[1]
+    
+    def snapshot(self):
+        """Снимок владельцев и зарядов клеток, очереди игроков и их иммунитета"""
+        phase = self.phase()
+        if phase not in (GameStateAttribute.WATING, GameStateAttribute.FINISH):
+            raise ValueError("Снимок доступен только между ходами")
+        return Snapshot(self.layout(), self.players.snapshot(),
+                        tuple(cell.model.position for cell in self.unstable), phase, self.zobrist)
+    
+    def restore(self, snapshot: Snapshot, render=True):
+        """Вернуть доску к снимку на месте: виды и связи не пересоздаются.
+
+        Возвращает клетки, состояние которых изменилось.
+        """
+        if snapshot.cells is not self.layout():
+            raise ValueError("Снимок сделан для другой топологии доски")
+        cells = self.cells
+        if self.engine is not None:
+            self.engine.flush()
+        changed = [cells[model.position] for model in snapshot.apply()]
+        self.players.restore(snapshot.players)
+        self.zobrist = snapshot.key
+        self.unstable = [cells[position] for position in snapshot.unstable]
+        self.index.settle()
+        if self.engine is not None and changed:
+            self.engine.sync(changed)
+        if snapshot.phase == GameStateAttribute.FINISH:
+            self.state = GameBoardStateFinish(self)
+        else:
+            self.state = GameBoardStateWating(self)
+        
+        if render:
+            self.redraw(changed)
+        return changed
+    
+    def seek(self, replay: Replay, move):
+        """Поставить доску в позицию записи после move ходов.
+
+        Доска восстанавливается из ближайшего ключевого кадра (или продолжает
+        с прошлой перемотки вперёд), ходы досчитываются без отрисовки,
+        перерисовываются только итоговые изменения.
+        """
+        if replay.map != self.map_hash:
+            raise ValueError("Запись сделана на другой карте")
+        move = max(0, min(move, len(replay)))
+        start, snapshot = replay.keyframe(move, self.layout())
+        changed = set()
+        
+        last = self._seek
+        if last is not None and last[0] is replay and start <= last[1] <= move and last[2] == self.position_hash():
+            start = last[1]
+        else:
+            changed.update(self.restore(snapshot, render=False))
+        
+        recording, self.replay = self.replay, None
+        try:
+            for row, col in replay.moves[start:move]:
+                result = self.resolve(row, col)
+                if result is None:
+                    raise ValueError(f"Ход {row} {col} записи невозможен")
+                changed.update(result.touched)
+        finally:
+            self.replay = recording
+        
+        self._seek = replay, move, self.position_hash()
+        self.redraw(changed)
+        return changed
+    
+    def redraw(self, cells):
+        """Обновить виды клеток после расчёта без отрисовки"""
+        if not self.rendered:
+            return
+        with TIMINGS.measure('cells.update'):
+            for cell in cells:
+                cell.view.update()
+        if RULES.HIDE_MODE or RULES.BLOCK_INSULAR:
+            self.refresh_fog()
+    
+    def rehash(self):
+        """Пересчитать ключ клеток с нуля, нужен только после сборки или правки доски"""
+        self.zobrist = 0
+        for cell in self.cells.values():
+            model = cell.model
+            self.zobrist ^= cell_zobrist(model.position, model.owner_id, model.power)
+        return self.zobrist
+    
+    def reindex(self):
+        """Собрать индекс территории заново по моделям клеток доски"""
+        self.index.rebuild(self.cells.values())
+        self.index.veiled = {cell.model for cell in self.cells.values()
+                             if cell.view is not None and cell.view.hidden}
+    
+    def edited(self):
+        """Правка доски закончена: индекс и ключ клеток пересчитываются под новую доску.
+
+        Старые записи к новой карте не подходят, запись начинается заново.
+        """
+        # Новая тень порта сбрасывает владельца и заряд всего порта в обход индекса
+        self.reindex()
+        self.rehash()
+        self.map_hash = map_hash(self.save())
+        self.replay = Replay(self.map_hash, self.players.queue()) if self.RECORD else None
+        self._seek = None
+    
+    def position_hash(self):
+        """64-битный ключ позиции: клетки, текущий игрок и иммунитеты, за O(1)"""
+        return self.zobrist ^ self.players.hash
+    
+    def refresh_fog(self):
+        """Перерисовать только клетки, у которых сменилась видимость"""
+        for model in self.index.flipped(RULES.observer()):
+            cell = self.cells.get(model.position)
+            if cell is not None:
+                cell.view.update()
+    
     def draw(self):
-        self.state.draw()
+        with TIMINGS.measure('draw'):
+            self.state.draw()
         
     def hit(self, row, col, player=None):
         return self.state.hit(row, col, player)
@@ -791,7 +888,8 @@ class GameBoard:
         return self.state.check()
     
     def update(self, dt):
-        return self.state.update(dt)
+        with TIMINGS.measure(f'update.{self.state.phase().name}'):
+            return self.state.update(dt)
     
     def __repr__(self):
         pass
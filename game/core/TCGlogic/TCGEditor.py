@@ -63,6 +63,14 @@ class EditTool:
     @property
     def batch(self):
         return self.editor._master.master.batch
+    
+    @property
+    def index(self):
+        return self.editor._master.master.index
+    
+    @property
+    def ports(self):
+        return self.editor._master.master.ports
 
     def update(self, dt):
         pass
@@ -89,8 +97,9 @@ class CreateCell(EditTool):
             if repalce:
                 pass
         else:
-            cell = TYPE_CELL[self.editor.tool_box.TYPE_CELL](w_pos, self.batch)
+            cell = TYPE_CELL[self.editor.tool_box.TYPE_CELL](w_pos, self.batch, ports=self.ports)
             self.cells[w_pos] = cell
+            self.index.attach(cell.model)
             
             if auto_link:
                 _auto_link(cell, w_pos, self.cells, 
@@ -116,7 +125,7 @@ class DeleteCell(EditTool):
             return
         cell = self.cells.get(w_pos)
         if cell:
-            render = [in_cell.position for in_cell in cell.model.incoming_links]
+            render = [in_cell.position for in_cell in cell.model.incoming_links.cells()]
             cell.delete()
             self.cells.pop(w_pos)
             for r in render:
@@ -134,18 +143,16 @@ class ClearLink(EditTool):
             return
         cell = self.cells.get(w_pos)
         if cell:
-            render = [in_cell.position for in_cell in cell.model.incoming_links]            
+            render = [in_cell.position for in_cell in cell.model.incoming_links.cells()]            
             
             if _default(in_, self.editor.tool_box.IN_LINK):
-                for icell in cell.model.incoming_links:
-                    icell.outgoing_links.remove(cell.model)
-                cell.model.incoming_links.clear()
+                for icell in list(cell.model.incoming_links.cells()):
+                    icell.unlink(cell.model, None)
             
             
             if _default(out, self.editor.tool_box.OUT_LINK):
-                for icell in cell.model.outgoing_links:
-                    icell.incoming_links.remove(cell.model)
-                cell.model.outgoing_links.clear()
+                for icell in list(cell.model.outgoing_links.cells()):
+                    cell.model.unlink(icell, None)
                 
             for r in render:
                 self.cells[r].render()
@@ -213,13 +220,11 @@ class UnLink(Link):
         
         if out:
             if cell_b.model in cell_a.model.outgoing_links:
-                cell_a.model.outgoing_links.remove(cell_b.model)
-                cell_b.model.incoming_links.remove(cell_a.model)
+                cell_a.model.unlink(cell_b.model)
 
         if in_:
             if cell_b.model in cell_a.model.incoming_links:
-                cell_a.model.incoming_links.remove(cell_b.model)
-                cell_b.model.outgoing_links.remove(cell_a.model)
+                cell_b.model.unlink(cell_a.model)
         cell_a.render()
         cell_b.render()   
 
@@ -0,0 +1,316 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .TCGModel import (CellModel, VoidCellModel, ProtectedCellModel,
+                      MagicCellModel, LogicCellModel, ENERGY, NO_OWNER, NEUTRAL, OTHER)
+
+KIND_CLASSIC = 0
+KIND_VOID = 1
+KIND_PROTECTED = 2
+KIND_MAGIC = 3
+KIND_LOGIC = 4
+
+
+def get_kind(model: CellModel):
+    if isinstance(model, VoidCellModel):
+        return KIND_VOID
+    if isinstance(model, ProtectedCellModel):
+        return KIND_PROTECTED
+    if isinstance(model, MagicCellModel):
+        return KIND_MAGIC
+    if isinstance(model, LogicCellModel):
+        return KIND_LOGIC
+    return KIND_CLASSIC
+
+
+class ArrayEngine:
+    """Расчёт волны цепной реакции пакетными операциями NumPy.
+
+    Состояние клеток хранится в плоских массивах, связи - в формате CSR.
+    Результат волны совпадает с поочерёдным вызовом reaction()/fill()
+    у моделей в порядке словаря клеток доски. Пока идёт реакция, состояние
+    живёт только в массивах: счётчики индекса территории сдвигаются одним
+    пакетом на волну, а модели и наборы клеток индекса получают его в flush().
+    """
+
+    @staticmethod
+    def available():
+        return np is not None
+
+    def __init__(self, cells, territory=None):
+        if np is None:
+            raise RuntimeError("Для ArrayEngine требуется numpy")
+
+        self.cells = list(cells)
+        self.models = [cell.model for cell in self.cells]
+        self.index = {model: i for i, model in enumerate(self.models)}
+        self.territory = territory
+        n = self.size = len(self.models)
+
+        self.kind = np.fromiter((get_kind(m) for m in self.models), np.int8, n)
+        self.lim = np.fromiter((m.lim for m in self.models), np.int64, n)
+        self.considered = np.fromiter((m.CONSIDERED for m in self.models), bool, n)
+        # playable(owner) зависит только от типа клетки: строка на тип, а не вызов на клетку
+        rows = {}
+        for model in self.models:
+            if type(model) not in rows:
+                rows[type(model)] = [False] + [model.playable(energy) for energy in ENERGY[1:]]
+        self.playable = np.array([rows[type(m)] for m in self.models], bool).reshape(n, len(ENERGY))
+
+        indptr = [0]
+        indices = []
+        for model in self.models:
+            indices.extend(self.index[out] for out in model.outgoing_links if out in self.index)
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, np.int64)
+        self.indices = np.array(indices, np.int64)
+        self.keys = np.fromiter((hash(m.position) for m in self.models), np.int64, n)
+        rows = np.fromiter((m.position[0] for m in self.models), np.int64, n).astype(np.uint64)
+        cols = np.fromiter((m.position[1] for m in self.models), np.int64, n).astype(np.uint64)
+        self.zobrist = _mix64(_mix64(rows) ^ cols)  # zobrist(row, col) без владельца и заряда
+
+        self._setup_ports()
+
+        self.owner = np.full(n, NEUTRAL, np.int8)
+        self.power = np.zeros(n, np.int64)
+        self.input_owner = np.zeros(n, np.int8)
+        self.input_power = np.zeros(n, np.int64)
+        self.stored = np.full(n, NEUTRAL, np.int8)  # владелец, записанный в модель
+        self.dirty = np.zeros(n, bool)              # состояние ещё не записано в модель
+        self.frontier = np.arange(n)
+
+    def _setup_ports(self):
+        # Теневые магические клетки одного порта делят владельца и заряд
+        origins = {}
+        port = np.full(self.size, -1, np.int64)
+        for i, model in enumerate(self.models):
+            if self.kind[i] == KIND_MAGIC:
+                port[i] = origins.setdefault(id(model.origin), len(origins))
+
+        self.port = port
+        self.ports = len(origins)
+        magic = np.flatnonzero(port >= 0)
+        self.port_members = magic[np.argsort(port[magic], kind='stable')]
+        self.port_indptr = np.searchsorted(port[self.port_members], np.arange(self.ports + 1))
+        self.port_last = self.port_members[self.port_indptr[1:] - 1]
+        self.port_complete = np.zeros(self.ports, bool)
+        for i in self.port_last:
+            origin = self.models[i].origin
+            self.port_complete[port[i]] = all(s in self.index for s in origin.shadow)
+
+    def sync(self, cells=None):
+        """Считать состояние из моделей.
+
+        Без аргументов перечитывает всю доску, иначе только указанные клетки,
+        которые и становятся фронтом следующей волны.
+        """
+        if cells is None:
+            idx = np.arange(self.size)
+        else:
+            idx = np.unique(np.fromiter((self.index[cell.model] for cell in cells), np.int64))
+        idx = self._expand(idx)
+        models = [self.models[i] for i in idx]
+        k = len(models)
+
+        self.owner[idx] = np.fromiter((m.owner_id for m in models), np.int8, k)
+        self.power[idx] = np.fromiter((m.power for m in models), np.int64, k)
+        self.input_power[idx] = np.fromiter((m.input_power for m in models), np.int64, k)
+        self.input_owner[idx] = np.fromiter((m.input_owner_id for m in models), np.int8, k)
+        self.stored[idx] = self.owner[idx]
+        self.dirty[idx] = False
+        self.frontier = idx
+
+    def store(self, changed, before):
+        """Отметить клетки, изменённые волной: счётчики индекса сдвигаются сразу, модели ждут flush()"""
+        owner = self.owner[changed]
+        moved = owner != before
+        if self.territory is not None and moved.any():
+            self._count(changed[moved], before[moved], owner[moved])
+        self.dirty[changed] = True
+
+    def flush(self, idx=None):
+        """Записать в модели и наборы индекса состояние клеток, изменённых после прошлой записи.
+
+        Без idx записываются все такие клетки. Возвращает их клетки.
+        """
+        if idx is None:
+            idx = np.flatnonzero(self.dirty)
+        self.dirty[idx] = False
+        owner, before = self.owner[idx], self.stored[idx]
+        moved = owner != before
+        if self.territory is not None and moved.any():
+            self._transfer(idx[moved], before[moved], owner[moved])
+        self.stored[idx] = owner
+        models = self.models
+        for i, owner_id, power, input_power, input_owner_id in zip(
+                idx.tolist(), owner.tolist(), self.power[idx].tolist(),
+                self.input_power[idx].tolist(), self.input_owner[idx].tolist()):
+            model = models[i]
+            model.owner_id = owner_id
+            model.power = power
+            model.input_power = input_power
+            model.input_owner_id = input_owner_id
+        return [self.cells[i] for i in idx.tolist()]
+
+    def _count(self, idx, old, new):
+        # Приращения счётчиков по владельцам - разность bincount до и после волны
+        size = len(ENERGY)
+        owned = (np.bincount(new[self.considered[idx]], minlength=size) -
+                 np.bincount(old[self.considered[idx]], minlength=size))
+        owned[NEUTRAL] = 0
+        moves = (np.bincount(new[self.playable[idx, new]], minlength=size) -
+                 np.bincount(old[self.playable[idx, old]], minlength=size))
+        self.territory.transfer({}, {}, {ENERGY[o]: d for o, d in enumerate(owned.tolist()) if d},
+                                {ENERGY[o]: d for o, d in enumerate(moves.tolist()) if d})
+
+    def _transfer(self, idx, old, new):
+        # Наборы клеток индекса: по владельцу на момент прошлой записи и по текущему
+        models = self.models
+        self.territory.transfer(
+            {ENERGY[o]: [models[i] for i in idx[old == o].tolist()] for o in np.unique(old).tolist()},
+            {ENERGY[o]: [models[i] for i in idx[new == o].tolist()] for o in np.unique(new).tolist()},
+            {}, {},
+            [models[i] for i in idx[(old == NEUTRAL) & self.playable[idx, NEUTRAL]].tolist()],
+            [models[i] for i in idx[(new == NEUTRAL) & self.playable[idx, NEUTRAL]].tolist()])
+
+    def _expand(self, idx):
+        # Порт магических клеток всегда обрабатывается целиком
+        ports = self.port[idx]
+        ports = np.unique(ports[ports >= 0])
+        if not ports.size:
+            return idx
+        starts, ends = self.port_indptr[ports], self.port_indptr[ports + 1]
+        return np.union1d(idx, self.port_members[_ranges(starts, ends - starts)])
+
+    def is_full(self, idx):
+        kind, owner, power = self.kind[idx], self.owner[idx], self.power[idx]
+        full = (owner != NEUTRAL) & (power >= self.lim[idx])
+        logic = kind == KIND_LOGIC
+        full[logic] = (owner[logic] != NEUTRAL) & (power[logic] != 0)
+        full[kind == KIND_VOID] = False
+        return full
+
+    def full_cells(self):
+        frontier = self.frontier
+        return [self.cells[i] for i in frontier[self.is_full(frontier)]]
+
+    def _reaction(self, idx):
+        kind, owner, power = self.kind[idx], self.owner[idx], self.power[idx]
+
+        fires = (owner != NEUTRAL) & (power >= self.lim[idx])
+        fires[kind == KIND_VOID] = False
+        logic = kind == KIND_LOGIC
+        fires[logic] = power[logic] >= self.lim[idx][logic]
+
+        reset = fires.copy()
+        reset[logic] = True
+        port = self.port[idx]
+        magic = port >= 0
+        reset[magic] = fires[magic] & self.port_complete[port[magic]]
+        self.power[idx[reset]] = 0
+
+        src = idx[fires]
+        starts = self.indptr[src]
+        counts = self.indptr[src + 1] - starts
+        targets = self.indices[_ranges(starts, counts)]
+        owners = np.repeat(owner[fires], counts)
+
+        alive = self.kind[targets] != KIND_VOID
+        targets, owners = targets[alive], owners[alive]
+        if not targets.size:
+            return targets
+
+        targets, inverse = np.unique(targets, return_inverse=True)
+        amount = np.bincount(inverse, minlength=targets.size)
+        self.input_power[targets] += amount
+
+        lo = np.full(targets.size, np.iinfo(np.int8).max, np.int8)
+        hi = np.zeros(targets.size, np.int8)
+        np.minimum.at(lo, inverse, owners)
+        np.maximum.at(hi, inverse, owners)
+
+        io = self.input_owner[targets]
+        same = (lo == hi) & ((io == NO_OWNER) | (io == lo))
+        self.input_owner[targets] = np.where(same, lo, NEUTRAL)
+        return targets
+
+    def _fill(self, idx):
+        owner, power = self.owner, self.power
+        io, ip = self.input_owner, self.input_power
+
+        plain = idx[self.port[idx] < 0]
+        power[plain] += ip[plain]
+        taken = np.where(io[plain] == NO_OWNER, owner[plain], io[plain])
+        owner[plain] = np.where(power[plain] > 0, taken, NEUTRAL)
+        io[plain] = NO_OWNER
+        ip[plain] = 0
+
+        protected = plain[(self.kind[plain] == KIND_PROTECTED) & (power[plain] == 0)]
+        owner[protected] = OTHER
+
+        magic = idx[self.port[idx] >= 0]
+        if magic.size:
+            ports, inverse = np.unique(self.port[magic], return_inverse=True)
+            last = self.port_last[ports]
+            port_power = np.zeros(ports.size, np.int64)
+            port_power[inverse] = power[magic]
+            port_power += np.bincount(inverse, weights=ip[magic], minlength=ports.size).astype(np.int64)
+            # Владельца порта определяет последняя клетка порта в порядке обхода
+            taken = np.where(io[last] == NO_OWNER, owner[last], io[last])
+            port_owner = np.where(port_power > 0, taken, NEUTRAL)
+            io[last] = NO_OWNER
+            ip[magic] = 0
+            power[magic] = port_power[inverse]
+            owner[magic] = port_owner[inverse]
+
+    def state_key(self, idx, owner, power):
+        """Ключи Зобриста состояний клеток idx, как cell_zobrist()"""
+        key = _mix64(_mix64(self.zobrist[idx] ^ owner.astype(np.uint64)) ^ power.astype(np.uint64))
+        key[(owner == NEUTRAL) & (power == 0)] = 0
+        return key
+
+    def frontier_key(self):
+        """Ключ фронта, совпадает с XOR hash(position) его клеток"""
+        return int(np.bitwise_xor.reduce(self.keys[self.frontier])) if self.frontier.size else 0
+    
+    def step(self):
+        """Одна волна: reaction() для фронта и fill() для фронта и заряженных им клеток.
+
+        Возвращает (есть ли полные клетки, номера изменённых клеток,
+        XOR ключей Зобриста их состояний до и после волны)
+        """
+        frontier = self.frontier
+        starts = self.indptr[frontier]
+        reach = self._expand(np.union1d(frontier, self.indices[_ranges(starts, self.indptr[frontier + 1] - starts)]))
+        owner, power, io = self.owner[reach], self.power[reach], self.input_owner[reach]
+
+        charged = self._reaction(frontier)
+        touched = self._expand(np.union1d(frontier, charged))
+        self._fill(touched)
+
+        changed = (owner != self.owner[reach]) | (power != self.power[reach]) | (io != self.input_owner[reach])
+        idx = reach[changed]
+        self.store(idx, owner[changed])
+        key = self.state_key(idx, owner[changed], power[changed]) ^ self.state_key(idx, self.owner[idx], self.power[idx])
+
+        full = touched[self.is_full(touched)]
+        self.frontier = self._expand(np.union1d(full, charged))
+        return bool(full.size), idx, int(np.bitwise_xor.reduce(key)) if key.size else 0
+
+
+def _mix64(x):
+    # splitmix64 из TCGModel над массивом uint64, умножение по модулю 2**64
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _ranges(starts, counts):
+    """Индексы, склеенные из отрезков [start, start + count)"""
+    total = int(counts.sum())
+    if not total:
+        return np.zeros(0, np.int64)
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
@@ -0,0 +1,483 @@
+"""Игроки, режимы и схемы карт без зависимостей от pyglet"""
+from enum import Enum, auto
+from random import shuffle
+from time import time
+from itertools import chain
+from math import pi, atan2
+from array import array
+from base64 import b64encode, b64decode
+from hashlib import sha256
+import json
+import zlib
+from .TCGModel import Energy, ENERGY, MagicPorts, ModelCell, create_model, model_type, zobrist
+
+
+class PlayersNode:
+    value: Energy
+    next: 'PlayersNode'
+    immunity: int
+    def __init__(self, player):
+        self.value = player
+        self.next = None
+        self.immunity = 1
+
+
+def turn_zobrist(player: Energy):
+    return zobrist(-1, player.value)
+
+
+def immunity_zobrist(player: Energy):
+    return zobrist(-2, player.value)
+
+        
+class Players:
+    SHUFFLE = False
+    def __init__(self, players=None):
+        
+        self.players = players or list()
+        self.ptr = None
+        self.hash = 0  # ключ Зобриста текущего игрока и иммунитетов
+    
+    def join(self, *args):
+        self.players.extend(args)
+
+    def leave(self, *args):
+        for p in args:
+            self.players.remove(p)
+    
+    def restart(self):
+        if len(self.players) < 2:
+            raise ValueError("Игроков должно быть минимум 2")
+        
+        queue = self.players.copy()
+        if self.SHUFFLE:
+            shuffle(queue)
+        
+        self.length = len(queue)
+        head = PlayersNode(queue.pop(0))
+        prev = head
+        while queue:
+            current = PlayersNode(queue.pop(0))
+            prev.next = current
+            prev = current
+        prev.next = head
+        
+        self.ptr = head
+        self.rehash()
+        
+
+    def next(self):
+        ptr = self.ptr
+        if ptr.immunity:
+            self.hash ^= immunity_zobrist(ptr.value)
+        ptr.immunity = 0
+        self.ptr = ptr.next
+        self.hash ^= turn_zobrist(ptr.value) ^ turn_zobrist(self.ptr.value)
+
+    def current(self):
+        return self.ptr.value if self.ptr is not None else Energy.NEUTRAL
+    
+    def queue(self):
+        lst = []
+        
+        head = self.ptr
+        prev = head
+        current = head.next
+        
+        while True:
+            lst.append(current.value)
+            prev = current
+            current = current.next
+            if current is head.next:
+                lst.insert(0, lst.pop())
+                return lst
+        
+    
+    def kick(self, player, forced=False):
+        if self.length < 2:
+            return
+        
+        head = self.ptr
+        prev = head
+        current = head.next
+
+        while current.value != player:
+            prev = current
+            current = current.next
+            if current is head.next:  # Элемент не найден
+                return
+        if current.immunity and not forced:
+            return
+        prev.next = current.next
+        if current.immunity:
+            self.hash ^= immunity_zobrist(current.value)
+        if current is head:
+            self.ptr = head.next
+            self.hash ^= turn_zobrist(head.value) ^ turn_zobrist(self.ptr.value)
+        self.length -= 1
+                
+    def has_winner(self):
+        return self.length < 2
+    
+    def snapshot(self):
+        """Очередь (игрок, иммунитет), начиная с текущего игрока"""
+        state = []
+        node = self.ptr
+        for _ in range(self.length if node is not None else 0):
+            state.append((node.value, node.immunity))
+            node = node.next
+        return tuple(state)
+    
+    def restore(self, state):
+        nodes = [PlayersNode(player) for player, _ in state]
+        for node, (_, immunity), next in zip(nodes, state, nodes[1:] + nodes[:1]):
+            node.immunity = immunity
+            node.next = next
+        self.ptr = nodes[0] if nodes else None
+        self.length = len(nodes)
+        self.rehash()
+    
+    def rehash(self):
+        key = 0
+        for player, immunity in self.snapshot():
+            if immunity:
+                key ^= immunity_zobrist(player)
+        if self.ptr is not None:
+            key ^= turn_zobrist(self.ptr.value)
+        self.hash = key
+        return key
+    
+    def winner(self):
+        return self.ptr.value
+    
+    def __repr__(self):
+        return str(self.queue())
+
+class Snapshot:
+    """Состояние доски между ходами.
+
+    Клетки (топология) общие у всех снимков доски, пока её не изменят,
+    копируются только owner_id, power, input_owner_id, input_power каждой
+    модели - по 4 числа в одном массиве.
+    """
+    __slots__ = ('cells', 'data', 'players', 'unstable', 'phase', 'key')
+    
+    FIELDS = 4
+    
+    def __init__(self, cells, players, unstable=(), phase=None, key=0):
+        self.cells = cells
+        self.data = self.pack(cell.model for cell in cells)
+        self.players = players
+        self.unstable = unstable
+        self.phase = phase
+        self.key = key  # ключ Зобриста клеток на момент снимка
+    
+    @staticmethod
+    def pack(models):
+        return array('i', chain.from_iterable(
+            (m.owner_id, m.power, m.input_owner_id, m.input_power) for m in models))
+    
+    def apply(self):
+        """Записать состояние в модели, возвращает модели, у которых оно изменилось"""
+        changed = {}  # модели без повторов, в порядке клеток
+        data = iter(self.data)
+        for cell, owner_id, power, input_owner_id, input_power in zip(self.cells, data, data, data, data):
+            model = cell.model
+            if (model.owner_id, model.power, model.input_owner_id, model.input_power) == \
+               (owner_id, power, input_owner_id, input_power):
+                continue
+            old = model.owner_id
+            shared = (old, model.power) != (owner_id, power)
+            model.owner_id = owner_id
+            model.power = power
+            model.input_owner_id = input_owner_id
+            model.input_power = input_power
+            changed[model] = None
+            if not shared:
+                continue
+            # Владелец и энергия магического порта общие - меняются все тени сразу
+            for m in model.group():
+                changed[m] = None
+                if old != owner_id and m.index is not None:
+                    m.index.update(m, ENERGY[old])
+        return list(changed)
+    
+    def dump(self):
+        """Снимок в виде словаря для JSON, клетки доски не сохраняются"""
+        return {
+            "data": b64encode(zlib.compress(self.data.tobytes())).decode(),
+            "players": [[player.name, immunity] for player, immunity in self.players],
+            "unstable": [list(position) for position in self.unstable],
+            "phase": self.phase.name if self.phase else None,
+            "key": f'{self.key:016x}',
+        }
+    
+    @classmethod
+    def load(cls, cells, dump):
+        """Снимок из словаря dump() для клеток cells той же карты"""
+        snapshot = cls.__new__(cls)
+        snapshot.cells = cells
+        snapshot.data = array('i')
+        snapshot.data.frombytes(zlib.decompress(b64decode(dump["data"])))
+        if len(snapshot.data) != cls.FIELDS * len(cells):
+            raise ValueError("Снимок сделан для другой карты")
+        snapshot.players = tuple((Energy[name], immunity) for name, immunity in dump["players"])
+        snapshot.unstable = tuple(tuple(position) for position in dump["unstable"])
+        snapshot.phase = dump["phase"] and GameStateAttribute[dump["phase"]]
+        snapshot.key = int(dump["key"], 16)
+        return snapshot
+    
+    def __len__(self):
+        return len(self.cells)
+    
+    def __repr__(self):
+        return f'<Snapshot cells={len(self.cells)} players={[p.name for p, _ in self.players]} phase={self.phase}>'
+
+
+class Replay:
+    """Запись партии: хеш карты, порядок игроков и ходы (row, col).
+
+    Каждые interval ходов перед ходом сохраняется ключевой кадр - снимок
+    доски, поэтому перемотка досчитывает не больше interval ходов.
+    """
+    VERSION = 1
+    INTERVAL = 50
+    
+    def __init__(self, map_hash, players, interval=None):
+        self.map = map_hash
+        self.players = list(players)   # очередь после Players.restart
+        self.moves = []
+        self.interval = interval or self.INTERVAL
+        self.keyframes = dict()        # номер хода -> Snapshot или его dump()
+    
+    def due(self):
+        """Нужен ли ключевой кадр перед следующим ходом"""
+        return len(self.moves) % self.interval == 0 and len(self.moves) not in self.keyframes
+    
+    def record(self, position):
+        self.moves.append(tuple(position))
+    
+    def keyframe(self, move, cells):
+        """Ближайший ключевой кадр не позже хода move: (номер хода, Snapshot)"""
+        start = max((m for m in self.keyframes if m <= move), default=None)
+        if start is None:
+            raise ValueError("В записи нет ключевого кадра до этого хода")
+        snapshot = self.keyframes[start]
+        if not isinstance(snapshot, Snapshot) or snapshot.cells is not cells:
+            if isinstance(snapshot, Snapshot):
+                snapshot = snapshot.dump()
+            snapshot = self.keyframes[start] = Snapshot.load(cells, snapshot)
+        return start, snapshot
+    
+    def dump(self):
+        return {
+            "version": self.VERSION,
+            "map": self.map,
+            "players": [player.name for player in self.players],
+            "interval": self.interval,
+            "moves": ' '.join(f'{row} {col}' for row, col in self.moves),
+            "keyframes": {str(move): snapshot if isinstance(snapshot, dict) else snapshot.dump()
+                          for move, snapshot in self.keyframes.items()},
+        }
+    
+    @classmethod
+    def load(cls, data):
+        replay = cls(data["map"], (Energy[name] for name in data["players"]), data["interval"])
+        fields = iter(map(int, data["moves"].split()))
+        replay.moves = list(zip(fields, fields))
+        replay.keyframes = {int(move): snapshot for move, snapshot in data["keyframes"].items()}
+        return replay
+    
+    def __len__(self):
+        return len(self.moves)
+    
+    def __repr__(self):
+        return f'<Replay map={self.map} moves={len(self.moves)} keyframes={len(self.keyframes)}>'
+
+
+def map_hash(scheme):
+    """Хеш содержимого карты - клеток и связей схемы, без метаданных"""
+    if isinstance(scheme, str):  # режим OLD - строка координат
+        content = scheme
+    else:
+        content = json.dumps(scheme.get("scheme"), sort_keys=True, separators=(',', ':'))
+    return sha256(content.encode()).hexdigest()[:16]
+
+    
+class Modes(Enum):
+    OLD = auto()
+    CLASSIC = auto()
+    EXTENDED = auto()
+    RECHARGED = auto()
+    DOUBLING = auto()
+    HIDDEN = auto()
+    
+    
+class GameStateAttribute(Enum):
+    DEFAULT = auto()
+    READY = auto()
+    WATING = auto()
+    REACTION = auto()
+    FINISH = auto()
+    EDIT = auto()
+    BUILD = auto()
+    
+class Saver:
+    def __init__(self, cells):
+        self.cells = cells
+        
+    def save_classic(self):
+        cell_buffer = []
+        cells = []
+        index = 0
+        for pos, cell in self.cells.items():
+            cell_buffer.append(cell.model)
+            row, col = pos
+            cells.append(f'{row} {col}')
+            index += 1
+        links = self.save_links(cell_buffer)
+        
+        
+        
+        return  {
+    "meta": {
+        "version": "0.0.2",
+        "name": "",
+        "creation_time": time(),
+        "description": "",
+        "author": None,
+        "modes": [Modes.CLASSIC.value],
+        "property": None
+    },
+    "scheme": {
+        "scanfmt": "ROW COL \\ CI0 CI1 TL",
+        "cells": ' '.join(cells),
+        "links": ' '.join(links)
+    }
+}
+    @staticmethod
+    def save_links(models):
+        """Связи в формате CI0 CI1 TL, каждая пара клеток - один раз, с кратностью"""
+        mark = {model: index for index, model in enumerate(models)}
+        links = []
+        for index, c in enumerate(models):
+            for other in dict.fromkeys(chain(c.outgoing_links.cells(), c.incoming_links.cells())):
+                ol = mark.get(other)
+                if ol is None or ol < index:
+                    continue
+                out = c.outgoing_links.count(other)
+                if ol == index:
+                    links.extend([f'{index} {ol} 0'] * out)
+                    continue
+                in_ = c.incoming_links.count(other)
+                two = min(out, in_)
+                links.extend([f'{index} {ol} 0'] * (out - two))
+                links.extend([f'{index} {ol} 1'] * (in_ - two))
+                links.extend([f'{index} {ol} 2'] * two)
+        return links
+    
+    @staticmethod
+    def sort_cells(center=(0,0)):
+        cx, cy = center
+        def calc(cell):
+            y, x = cell[0]
+            dx, dy = x - cx, y - cy
+
+            return dx * dx + dy * dy, atan2(dy, dx) + pi
+        return calc
+    
+    @staticmethod
+    def calc_center(cells):
+        minx, miny, \
+        maxx, maxy = float('inf'), float('inf'), -float('inf'), -float('inf')
+        for pos, cell in cells:
+            y, x = pos
+
+            minx = min(minx, x)
+            maxx = max(maxx, x)
+            miny = min(miny, y)
+            maxy = max(maxy, y)
+        return (maxx + minx) / 2, (maxy + miny) / 2
+
+    def save_extanded(self):
+        cell_buffer2 = list(self.cells.items())
+        center = self.calc_center(cell_buffer2)
+        calc = self.sort_cells(center)
+        from math import floor, ceil
+        dcol, drow = map(floor, center)
+
+        cell_buffer2.sort(key=calc)
+
+        cells = []
+        index = 0
+
+        cell_buffer = []
+
+        for pos, cell in cell_buffer2:
+            cell_buffer.append(cell.model)
+            row, col = pos
+            cells.append(f'{row - drow} {col-dcol} {model_type(cell.model)}')
+            index += 1
+        links = self.save_links(cell_buffer)
+        
+        
+        
+        return  {
+    "meta": {
+        "version": "0.0.2",
+        "name": "",
+        "creation_time": time(),
+        "description": "",
+        "author": None,
+        "modes": [Modes.EXTENDED.value],
+        "property": None
+    },
+    "scheme": {
+        "scanfmt": "ROW COL TC\\ CI0 CI1 TL",
+        "cells": ' '.join(cells),
+        "links": ' '.join(links)
+    }
+}
+
+
+def read_scheme(scheme):
+    """Разобрать схему в списки (row, col, tc) клеток и (ci0, ci1, tl) связей"""
+    scheme = scheme.get("scheme")
+    scanfmt: str = scheme.get("scanfmt")
+    cellf, linkf = scanfmt.lower().split('\\')
+    cellf = cellf.split()
+    linkf = linkf.split()
+    
+    cells = []
+    fields = iter(scheme.get("cells").split())
+    for args in zip(*([fields]*len(cellf))):
+        d = dict(zip(cellf, args))
+        cells.append((int(d.get('row')), int(d.get('col')), int(d.get('tc', 0))))
+    
+    links = []
+    fields = iter(scheme.get("links").split())
+    for args in zip(*([fields]*len(linkf))):
+        d = dict(zip(linkf, args))
+        links.append((int(d.get('ci0')), int(d.get('ci1')), int(d.get('tl'))))
+    return cells, links
+
+
+def link_models(a, b, type=0):
+    match type:
+        case 0: # a --> b
+            a.link(b)
+        case 1: # a <-- b
+            b.link(a)
+        case 2: # a <-> b
+            b.link(a)
+            a.link(b)
+
+
+def build_models(scheme, ports=None):
+    """Клетки схемы без видов: позиция -> ModelCell"""
+    ports = MagicPorts() if ports is None else ports
+    cells, links = read_scheme(scheme)
+    models = [create_model(tc, (row, col), ports) for row, col, tc in cells]
+    for c1, c2, tl in links:
+        link_models(models[c1], models[c2], tl)
+    return {model.position: ModelCell(model) for model in models}
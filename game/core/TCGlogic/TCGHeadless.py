@@ -0,0 +1,28 @@
+"""Доска без окна для скриптов и тестов: схема из списков клеток и связей и сборка доски под resolve()"""
+from .TCGBoard import GameBoard
+from .TCGGame import Players, Modes
+from .TCGModel import Energy
+
+
+def scheme(cells, links, types=None):
+    """Схема из клеток (row, col), связей (ci0, ci1, tl) и кодов типов клеток по позиции"""
+    types = types or {}
+    return {
+        "meta": {"version": "0.0.2", "modes": [Modes.EXTENDED.value]},
+        "scheme": {
+            "scanfmt": "ROW COL TC\\ CI0 CI1 TL",
+            "cells": ' '.join(f'{row} {col} {types.get((row, col), 0)}' for row, col in cells),
+            "links": ' '.join(f'{a} {b} {tl}' for a, b, tl in links),
+        }
+    }
+
+
+def make_board(data, players=(Energy.P1, Energy.P2), mode=Modes.EXTENDED, board=None):
+    """Собранная доска без видов, ход - через resolve(). Переданная board собирается заново"""
+    if board is None:
+        board = GameBoard(None)
+    board.players = Players(list(players))
+    board.build(data, render=False)
+    board.restart(mode)
+    board.state.complete()
+    return board
@@ -0,0 +1,189 @@
+from collections import Counter, defaultdict, deque
+from .TCGModel import Energy, RULES, CellModel, NEUTRAL
+
+
+class TerritoryIndex:
+    """Счётчики территории и доступных ходов для каждого игрока.
+
+    Модели клеток доски ссылаются на индекс через `model.index` и сообщают
+    ему о смене владельца в fill(), поэтому проверки выбывания и пата
+    стоят O(игроков), а не O(клеток).
+
+    Смена владельца только помечает кэши устаревшими, они пересчитываются
+    при первом запросе. Пока идёт реакция (defer() ... settle()), области
+    достижимости остаются с начала хода и строятся заново после неё.
+    """
+
+    def __init__(self):
+        self.owned = Counter()  # клетки, которые засчитываются владельцу
+        self.moves = Counter()  # клетки, по которым владелец может походить
+        self.free = set()       # нейтральные клетки, доступные для хода
+        self.cells = defaultdict(set)  # все клетки по владельцам
+        self.models = set()
+        self.veiled = set()     # клетки, отрисованные скрытыми
+        self._reach = dict()
+        self._hidden = dict()
+        self._stale = False        # владельцы менялись после построения кэшей
+        self._reach_stale = False  # области достижимости ждут конца реакции
+        self.deferred = False
+        self.topology = 0      # растёт при любом изменении набора клеток или связей
+
+    def rebuild(self, cells):
+        self.clear()
+        for cell in cells:
+            self.attach(cell.model)
+
+    def clear(self):
+        self.owned.clear()
+        self.moves.clear()
+        self.free.clear()
+        self.cells.clear()
+        self.models.clear()
+        self.veiled.clear()
+        self.deferred = False
+        self.topology += 1
+        self._invalidate()
+
+    def attach(self, model: CellModel):
+        model.index = self
+        self.models.add(model)
+        self.topology += 1
+        self._count(model, model.owner, 1)
+
+    def detach(self, model: CellModel):
+        if model.index is not self:
+            return
+        self._count(model, model.owner, -1)
+        self.models.discard(model)
+        self.veiled.discard(model)
+        model.index = None
+        self.topology += 1
+
+    def update(self, model: CellModel, owner: Energy):
+        """Владелец клетки сменился с owner на model.owner"""
+        self._count(model, owner, -1)
+        self._count(model, model.owner, 1)
+
+    def transfer(self, removed, added, owned, moves, taken=(), freed=()):
+        """Пакетная смена владельцев: то же, что update() для каждой клетки.
+
+        removed и added - модели по прежнему и новому владельцу, owned и moves -
+        приращения счётчиков, taken и freed - ушедшие из free и пришедшие в free.
+        """
+        for owner, models in removed.items():
+            self.cells[owner].difference_update(models)
+        for owner, models in added.items():
+            self.cells[owner].update(models)
+        self.owned.update(owned)
+        self.moves.update(moves)
+        self.free.difference_update(taken)
+        self.free.update(freed)
+        self._stale = True
+
+    def changed(self):
+        """Изменились связи между клетками"""
+        self.topology += 1
+        self._invalidate()
+
+    def defer(self):
+        """Началась реакция: области достижимости не пересчитываются до settle()"""
+        self.deferred = True
+
+    def settle(self):
+        self.deferred = False
+
+    def _invalidate(self):
+        self._reach.clear()
+        self._hidden.clear()
+        self._stale = self._reach_stale = False
+
+    def _refresh(self):
+        if self._stale:
+            self._hidden.clear()
+            self._stale = False
+            self._reach_stale = True
+        if self._reach_stale and not self.deferred:
+            self._invalidate()
+
+    def _count(self, model, owner, sign):
+        self._stale = True
+        if sign > 0:
+            self.cells[owner].add(model)
+        else:
+            self.cells[owner].discard(model)
+        if model.CONSIDERED and owner != Energy.NEUTRAL:
+            self.owned[owner] += sign
+        if model.playable(owner):
+            self.moves[owner] += sign
+            if owner == Energy.NEUTRAL:
+                if sign > 0:
+                    self.free.add(model)
+                else:
+                    self.free.discard(model)
+
+    def alive(self, player):
+        return self.owned[player] > 0
+
+    def has_move(self, player):
+        if self.moves[player]:
+            return True
+        if not self.free:
+            return False
+        if not (RULES.BLOCK_INSULAR or RULES.BLOCK_SURROUNDED):
+            return True
+        return any(model.hit(owner=player) for model in self.free)
+
+    def reachable(self, model: CellModel, owner: Energy):
+        """Есть ли путь от клеток владельца до клетки через нейтральные клетки"""
+        return model in self._get_reach(owner)
+
+    def _get_reach(self, owner):
+        self._refresh()
+        reach = self._reach.get(owner)
+        if reach is None:
+            reach = self._reach[owner] = self._label(owner)
+        return reach
+
+    def _label(self, owner):
+        # Один проход из всех клеток владельца сразу, вглубь только через нейтральные
+        reach = set(self.cells[owner])
+        queue = deque(reach)
+        while queue:
+            current = queue.popleft()
+            for out in current.outgoing_links:
+                if out in reach:
+                    continue
+                reach.add(out)
+                if out.owner_id == NEUTRAL:
+                    queue.append(out)
+        return reach
+
+    def hidden(self, observer):
+        """Клетки, скрытые от наблюдателя, за один проход по графу"""
+        fog = RULES.FOG_OF_WAR and RULES.BLOCK_INSULAR and not RULES.immune()
+        key = observer, fog, RULES.HIDE_MODE
+        self._refresh()
+        hidden = self._hidden.get(key)
+        if hidden is None:
+            hidden = set()
+            if fog:
+                hidden = self.models - self._get_reach(observer)
+            if RULES.HIDE_MODE:
+                for owner, cells in self.cells.items():
+                    if owner not in (observer, Energy.NEUTRAL):
+                        hidden |= cells
+            self._hidden[key] = hidden
+        return hidden
+
+    def is_hidden(self, model: CellModel, observer: Energy):
+        return model in self.hidden(observer)
+
+    def veil(self, model: CellModel, hidden):
+        if hidden:
+            self.veiled.add(model)
+        else:
+            self.veiled.discard(model)
+
+    def flipped(self, observer):
+        """Клетки, видимость которых изменилась с последней отрисовки"""
+        return self.hidden(observer) ^ self.veiled
@@ -0,0 +1,656 @@
+"""Модели клеток и правила игры без зависимостей от pyglet"""
+from enum import Enum, auto
+from typing import Tuple
+from collections import deque
+from itertools import chain, repeat
+
+
+class RULES: # ЗАДЕЛ НА БУДУЩЕЕ
+    _context = None
+    
+    BLOCK_SURROUNDED = 0
+    BLOCK_INSULAR = 1
+    HIDE_MODE = 0
+    FOG_OF_WAR = 1
+    ONLINE_MODE = 0
+    WALLS = 1
+    
+    @classmethod
+    def context(cls, ctx=None):
+        cls._context = ctx
+    
+    @classmethod
+    def observer(cls):
+        try:
+            return RULES._context.this if cls.ONLINE_MODE else RULES._context.players.ptr.value
+        except:
+            return Energy.NEUTRAL
+    
+    @classmethod
+    def immune(cls):
+        try:
+            return bool(cls._context.players.ptr.immunity)
+        except:
+            return True
+    
+    @classmethod
+    def is_hide(cls, cell):
+        owner = cls.observer()
+        if cell.index is not None:
+            return cell.index.is_hidden(cell, owner)
+        
+        a_factor = b_factor = c_factor = False
+        a_factor = cls.HIDE_MODE and (cell.owner not in [owner, Energy.NEUTRAL]) 
+        b_factor = cls.FOG_OF_WAR and cls.BLOCK_INSULAR and (not RULES.reachable(cell, owner))
+
+        return a_factor or b_factor
+
+    @classmethod
+    def reachable(cls, cell, owner):
+        if not cls.BLOCK_INSULAR:
+            return True
+        if cls.immune():
+            return True
+        if cell.owner == owner:
+            return True
+        if cell.index is not None:
+            return cell.index.reachable(cell, owner)
+        
+        visited = set()
+        queue = deque([cell])
+        visited.add(cell)
+        
+        while queue:
+            current = queue.popleft()
+            for next in current.incoming_links:
+                if (next not in visited):
+                    if next.owner == owner:
+                        return True
+                    if next.owner == Energy.NEUTRAL:
+                        visited.add(next)
+                        queue.append(next)
+    @classmethod
+    def surrounded(cls, cell):
+        if not cls.BLOCK_SURROUNDED or cell.owner != Energy.NEUTRAL:
+            return 
+        
+        sur = {en.owner for en in cell.outgoing_links}
+        
+        if (len(sur) == 1):
+            return sur.pop()
+
+
+N = 1 << 0
+E = 1 << 1
+S = 1 << 2
+W = 1 << 3
+ALL = N | E | S | W
+
+_2N = 1 << 4
+_2E = 1 << 5
+_2S = 1 << 6
+_2W = 1 << 7
+
+N2N = N | _2N
+E2E = E | _2E
+S2S = S | _2S
+W2W = W | _2W
+
+SIDES = [N, E, S, W, # CLASSIC
+         _2N, _2E, _2S, _2W, # DOUBLE
+        N2N, E2E, S2S, W2W, # SPLIT
+        ]
+
+
+class Energy(Enum):
+    NEUTRAL = auto()
+    OTHER = auto()
+
+    P1 = auto()
+    P2 = auto()
+    P3 = auto()
+    P4 = auto()
+    P5 = auto()
+    P6 = auto()
+    P7 = auto()
+    P8 = auto()
+    
+P_ENERGY = [
+    Energy.P1,
+    Energy.P2,
+    Energy.P3,
+    Energy.P4,
+    Energy.P5,
+    Energy.P6,
+    Energy.P7,
+    Energy.P8
+]
+
+S_ENERGY = [
+    Energy.NEUTRAL,
+    Energy.OTHER 
+]
+
+# Модели хранят владельца кодом Energy.value, 0 - владельца нет (None)
+ENERGY = (None, *Energy)
+NO_OWNER = 0
+NEUTRAL = Energy.NEUTRAL.value
+OTHER = Energy.OTHER.value
+
+MASK64 = (1 << 64) - 1
+
+
+def _mix64(x):
+    # splitmix64: одинаковый результат на всех клиентах, в отличие от hash() строк
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def zobrist(*values):
+    """64-битный ключ Зобриста для набора целых чисел"""
+    key = 0
+    for value in values:
+        key = _mix64(key ^ (value & MASK64))
+    return key
+
+
+def cell_zobrist(position, owner_id, power):
+    """Ключ состояния клетки, у пустой нейтральной клетки - 0"""
+    if owner_id == NEUTRAL and not power:
+        return 0
+    row, col = position
+    return zobrist(row, col, owner_id, power)
+
+
+def get_color(energy):
+    return {
+        Energy.NEUTRAL: (250,250,250),
+        Energy.OTHER: (132,132,132),
+            
+        
+        Energy.P1: (255, 150, 150),    # Теплый розовый
+        Energy.P2: (150, 255, 150),    # Светло-лаймовый
+        Energy.P3: (150, 150, 255),    # Лавандово-синий
+        Energy.P4: (255, 255, 150),    # Солнечный желтый
+        Energy.P5: (255, 150, 255),    # Орхидея
+        Energy.P6: (150, 255, 255),    # Аквамарин
+        Energy.P7: (255, 200, 100),    # Апельсиновый
+        Energy.P8: (100, 115, 255) 
+        }[energy]
+
+
+class Links:
+    """Связи клетки: соседняя клетка и кратность связи с ней.
+
+    Добавление, удаление и проверка наличия за O(1). Обход идёт в порядке
+    добавления, каждая клетка выдаётся столько раз, какова кратность.
+    """
+    __slots__ = ('_counts', '_total', '_flat')
+    
+    def __init__(self, cells=()):
+        self._counts = dict()
+        self._total = 0
+        self._flat = ()
+        for cell in cells:
+            self.add(cell)
+    
+    def add(self, cell, count=1):
+        self._counts[cell] = self._counts.get(cell, 0) + count
+        self._total += count
+        self._flat = None
+    
+    def remove(self, cell, count=1):
+        have = self._counts.get(cell, 0)
+        if have < count:
+            raise ValueError(f"Нет {count} связей с {cell}")
+        if have == count:
+            del self._counts[cell]
+        else:
+            self._counts[cell] = have - count
+        self._total -= count
+        self._flat = None
+    
+    def pop(self, cell):
+        """Удалить все связи с клеткой и вернуть их кратность"""
+        count = self._counts.pop(cell, 0)
+        if count:
+            self._total -= count
+            self._flat = None
+        return count
+    
+    def count(self, cell):
+        return self._counts.get(cell, 0)
+    
+    def cells(self):
+        """Соседние клетки без повторов"""
+        return self._counts.keys()
+    
+    def items(self):
+        return self._counts.items()
+    
+    def clear(self):
+        self._counts.clear()
+        self._total = 0
+        self._flat = ()
+    
+    def copy(self):
+        links = Links()
+        links._counts = self._counts.copy()
+        links._total = self._total
+        links._flat = self._flat
+        return links
+    
+    def __contains__(self, cell):
+        return cell in self._counts
+    
+    def __len__(self):
+        return self._total
+    
+    def __iter__(self):
+        # Развёрнутый кортеж кешируется: связи меняются редко, а обходятся в каждой волне
+        if self._flat is None:
+            self._flat = tuple(chain.from_iterable(repeat(cell, count) for cell, count in self._counts.items()))
+        return iter(self._flat)
+    
+    def __repr__(self):
+        return f'Links({list(self)})'
+
+
+class CellModel:
+    position: Tuple[int, int]
+    owner_id: int
+    input_owner_id: int
+    power: int
+    input_power: int
+    lim: int
+    outgoing_links: Links
+    incoming_links: Links
+    
+    __slots__ = ('position', 'owner_id', 'power', 'input_owner_id', 'input_power',
+                 'outgoing_links', 'incoming_links', 'lim', 'index')
+    
+    CONSIDERED = True
+    
+    def __init__(self, position):
+        self.position = tuple(position)
+        self.owner_id = NEUTRAL
+        self.power = 0
+        self.input_owner_id = NO_OWNER
+        self.input_power = 0
+        self.outgoing_links = Links()   # ссылки на другие клетки
+        self.incoming_links = Links()   # ссылки от других клеток
+        self.index = None
+        self._relim()
+    
+    @property
+    def owner(self) -> Energy:
+        return ENERGY[self.owner_id]
+    
+    @owner.setter
+    def owner(self, value: Energy):
+        self.owner_id = value.value
+    
+    @property
+    def input_owner(self) -> Energy:
+        return ENERGY[self.input_owner_id]
+    
+    @input_owner.setter
+    def input_owner(self, value: Energy):
+        self.input_owner_id = NO_OWNER if value is None else value.value
+        
+    def __eq__(self, other: 'CellModel'):
+        return self.position == other.position
+
+    def __hash__(self):
+        return hash(self.position)
+    
+    def is_full(self):
+        return self.owner_id != NEUTRAL and self.power >= self.lim
+    
+    def is_considered(self):
+        return self.owner_id != NEUTRAL
+    
+    def playable(self, owner):
+        return True
+    
+    def lim_power(self):
+        return self.lim
+    
+    def _relim(self):
+        self.lim = len(self.outgoing_links)
+    
+    def hit(self, position=None, owner=None):
+        owner = owner or self.owner
+        position = position or self.position
+        
+        if (pl := RULES.surrounded(self)):
+            if (pl != Energy.NEUTRAL) and pl != owner:
+                return
+        
+        if not RULES.reachable(self, owner):
+            return
+
+        return self.position == position and (self.owner_id in (owner.value, NEUTRAL))
+    
+    def group(self):
+        return (self,)
+    
+    def link(self, other: 'CellModel'):
+        self.outgoing_links.add(other)
+        other.incoming_links.add(self)
+        self._relim()
+        if self.index is not None:
+            self.index.changed()
+    
+    def unlink(self, other: 'CellModel', count=1):
+        """Удалить count связей self -> other, при count=None - все"""
+        if count is None:
+            count = self.outgoing_links.count(other)
+        self.outgoing_links.remove(other, count)
+        other.incoming_links.remove(self, count)
+        self._relim()
+        if self.index is not None:
+            self.index.changed()
+        
+    def charge(self, owner: Energy, amount=1):
+        self.charge_id(owner.value, amount)
+    
+    def charge_id(self, owner_id, amount=1):
+        self.input_power += amount
+        input_owner_id = self.input_owner_id
+        self.input_owner_id = owner_id if input_owner_id in (NO_OWNER, owner_id) else NEUTRAL
+    
+    def fill(self):
+        owner_id = self.owner_id
+        self.power += self.input_power
+        self.input_power = 0
+        if not self.power:
+            self.owner_id = NEUTRAL
+        elif self.input_owner_id != NO_OWNER:
+            self.owner_id = self.input_owner_id
+        self.input_owner_id = NO_OWNER
+        if self.index is not None and owner_id != self.owner_id:
+            self.index.update(self, ENERGY[owner_id])
+        
+    def reaction(self):
+        if self.is_full():
+            self.power = 0
+            owner_id = self.owner_id
+            for cell in self.outgoing_links:
+                cell.charge_id(owner_id)
+                #self.owner = Energy.NEUTRAL
+            
+    def copy(self):
+        """Отвязанная от доски копия того же типа, соседние клетки о ней не знают.
+        
+        Для сохранения и отката состояния доски - GameBoard.snapshot()
+        """
+        cls = type(self)
+        cell = object.__new__(cls)
+        for base in cls.__mro__:
+            for slot in getattr(base, '__slots__', ()):
+                # Слоты, закрытые свойствами (общие поля магического порта), не копируются
+                if not isinstance(getattr(cls, slot), property) and hasattr(self, slot):
+                    setattr(cell, slot, getattr(self, slot))
+        cell.incoming_links = self.incoming_links.copy()
+        cell.outgoing_links = self.outgoing_links.copy()
+        cell.index = None
+        return cell
+        
+    def delete(self):
+        if self.index is not None:
+            self.index.detach(self)
+        
+        for cell in self.incoming_links.cells():
+            cell: CellModel
+            cell.outgoing_links.pop(self)
+            cell._relim()
+            
+        for cell in self.outgoing_links.cells():
+            cell: CellModel
+            cell.incoming_links.pop(self)
+        
+        self.outgoing_links.clear()
+        self.incoming_links.clear()
+        self._relim()
+    
+    def __repr__(self):
+        row, col = self.position
+        
+        return f'<Cell row={row} col={col} power={self.power} owner={self.owner.name}>'
+    
+def get_side(cell:CellModel, other: CellModel, dist=1):
+    r1, c1 = cell.position
+    r2, c2 = other.position
+    dx = (c2-c1)
+    dy = (r2-r1)
+
+    if dx == 0:
+        if dy == dist:
+            return N
+        elif dy == -dist:
+            return S
+    elif dy == 0:
+        if dx == dist:
+            return E
+        elif dx == -dist:
+            return W
+    
+    return 0    
+
+
+class CloseCellModel(CellModel):
+    __slots__ = ()
+    
+    CONSIDERED = False
+    
+    def hit(self, position=None, owner=None):
+        return None
+            
+    def is_considered(self):
+        return 
+    
+    def playable(self, owner):
+        return False
+
+
+class VoidCellModel(CloseCellModel):
+    __slots__ = ()
+    
+    def charge_id(self, owner_id, amount=1):
+        return 
+    def is_full(self):
+        return 
+    def link(self, other):
+        return 
+
+
+class ProtectedCellModel(CellModel):
+    __slots__ = ()
+    
+    def __init__(self, position):
+        super().__init__(position)
+        self.owner_id = OTHER
+
+    def hit(self, position=None, owner=None):
+        owner = owner or self.owner
+        position = position or self.position
+        return self.position == position and self.owner_id == owner.value
+
+    def playable(self, owner):
+        return owner != Energy.NEUTRAL
+
+    def fill(self):
+        super().fill()
+        if not self.power and self.owner_id != OTHER:
+            owner_id = self.owner_id
+            self.owner_id = OTHER
+            if self.index is not None:
+                self.index.update(self, ENERGY[owner_id])
+
+
+class MagicPortModel(CellModel):
+    """Общие владелец, заряд и предел теневых клеток одного порта"""
+    __slots__ = ('shadow', 'reacted', 'port')
+    
+    def __init__(self, position, port=0):
+        self.port = port
+        self.shadow = []
+        self.reacted = 0   # сколько теней прореагировало с последнего fill()
+        super().__init__(position)
+
+
+class MagicPorts:
+    """Магические порты одной доски: общие модели и виды теневых клеток"""
+    
+    def __init__(self):
+        self.models = dict()
+        self.views = dict()
+    
+    def model(self, port, position):
+        origin = self.models.get(port)
+        if origin is None:
+            origin = self.models[port] = MagicPortModel(position, port)
+        return origin
+    
+    def view(self, port):
+        return self.views.setdefault(port, [])
+    
+    def clear(self):
+        self.models.clear()
+        self.views.clear()
+
+
+class MagicCellModel(CellModel):
+    __slots__ = ('origin', 'reacted', 'own_lim')
+    
+    origin: MagicPortModel
+
+    def __init__(self, position, port=0, ports=None):
+        # Клетка без доски получает свой порт, а не общий на все доски
+        self.origin = (MagicPorts() if ports is None else ports).model(port, position)
+        self.own_lim = 0
+        super().__init__(position)
+        self.origin.shadow.append(self)
+        self.reacted = False
+    
+    @property
+    def owner_id(self):
+        return self.origin.owner_id
+    
+    @property
+    def power(self):
+        return self.origin.power
+    
+    @property
+    def lim(self):
+        return self.origin.lim
+    
+    @owner_id.setter
+    def owner_id(self, value):
+        self.origin.owner_id = value
+        
+    @power.setter
+    def power(self, value):
+        self.origin.power = value
+    
+    def _relim(self):
+        # Предел порта - сумма исходящих связей теней, меняется на разницу
+        lim = len(self.outgoing_links)
+        self.origin.lim += lim - self.own_lim
+        self.own_lim = lim
+    
+    def _react(self, reacted):
+        if self.reacted != reacted:
+            self.reacted = reacted
+            self.origin.reacted += 1 if reacted else -1
+    
+    def fill(self):
+        self._react(False)
+        self.power += self.input_power
+        self.input_power = 0
+        if not self.origin.reacted:
+            owner_id = self.owner_id
+            if not self.power:
+                self.owner_id = NEUTRAL
+            elif self.input_owner_id != NO_OWNER:
+                self.owner_id = self.input_owner_id
+            self.input_owner_id = NO_OWNER
+            if owner_id != self.owner_id:
+                owner = ENERGY[owner_id]
+                for cell in self.origin.shadow:
+                    if cell.index is not None:
+                        cell.index.update(cell, owner)
+    
+    def reaction(self):
+        self._react(True)
+        if self.is_full():
+            if self.origin.reacted == len(self.origin.shadow):
+                self.power = 0 
+            owner_id = self.owner_id
+            for cell in self.outgoing_links:
+                cell.charge_id(owner_id)
+    
+    def group(self):
+        return self.origin.shadow
+    
+    def delete(self):
+        super().delete()
+        self._react(False)
+        self.origin.shadow.remove(self)
+
+
+class LogicCellModel(CellModel):
+    __slots__ = ()
+    
+    def is_full(self):
+        return self.owner_id != NEUTRAL and self.power != 0
+    
+    def reaction(self):
+        if self.power >= self.lim:
+            self.power = 0
+            owner_id = self.owner_id
+            for cell in self.outgoing_links:
+                cell.charge_id(owner_id)
+        else:
+            self.power = 0
+
+
+# Типы клеток схемы: индекс совпадает с TYPE_CELL в TCGCell
+MAGIC_PORT_IDS = [0, 85, 170, 42, 128, 213]
+
+MODEL_TYPE = [CellModel, CloseCellModel, VoidCellModel, ProtectedCellModel,
+              *(MagicCellModel for _ in MAGIC_PORT_IDS), LogicCellModel]
+
+
+def create_model(tc, position, ports=None):
+    """Модель клетки по коду типа из схемы"""
+    if MODEL_TYPE[tc] is MagicCellModel:
+        return MagicCellModel(position, MAGIC_PORT_IDS[tc - MODEL_TYPE.index(MagicCellModel)], ports)
+    return MODEL_TYPE[tc](position)
+
+
+def model_type(model: CellModel):
+    """Код типа клетки для схемы"""
+    if isinstance(model, MagicCellModel):
+        return MODEL_TYPE.index(MagicCellModel) + MAGIC_PORT_IDS.index(model.origin.port)
+    return MODEL_TYPE.index(type(model))
+
+
+class ModelCell:
+    """Клетка без вида - для доски, которая считается без OpenGL"""
+    view = None
+    
+    def __init__(self, model: CellModel):
+        self.model = model
+        
+    def delete(self):
+        self.model.delete()
+    
+    def render(self):
+        return
+        
+    def __repr__(self):
+        return str(self.model)
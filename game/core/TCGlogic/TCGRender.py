@@ -0,0 +1,723 @@
+"""Отрисовка всех клеток доски одним инстансным вызовом"""
+from array import array
+from itertools import product
+from math import floor
+import ctypes
+import pyglet
+from pyglet import gl
+from pyglet.graphics import Batch
+from pyglet.image import ImageData
+from pyglet.sprite import Sprite
+from pyglet.graphics.vertexbuffer import BufferObject
+from pyglet.graphics.vertexarray import VertexArray
+from ..Pyglet.Atlas import RenderAtlas, SlotAllocator
+from ..Timings import TIMINGS
+from .TCGModel import N, E, S, W
+
+
+# Флаги экземпляра
+VISIBLE = 1 << 0
+HIDDEN = 1 << 1   # клетка скрыта от наблюдателя
+GHOST = 1 << 2    # полупрозрачная клетка
+PORT = 1 << 3     # рамка цвета магического порта
+
+# Атрибуты экземпляра: имя, число float, смещение
+ATTRIBUTES = (
+    ('a_cell', 4),    # колонка, строка, вид тела, флаги
+    ('a_sensor', 4),  # цвет владельца, доля заряда
+    ('a_port', 3),    # цвет порта
+    ('a_links', 1),   # маска сторон
+    ('a_counter', 1), # глифы числа, по COUNTER_BITS бит на знак
+)
+STRIDE = sum(count for _, count in ATTRIBUTES)
+OFFSET = dict()
+_offset = 0
+for _name, _count in ATTRIBUTES:
+    OFFSET[_name] = _offset
+    _offset += _count
+FLAGS = OFFSET['a_cell'] + 3
+
+# Ребро стены: колонка и строка его начала, направление
+WALL_ATTRIBUTES = (
+    ('a_edge', 3),
+)
+HORIZONTAL, VERTICAL = 1, 2  # 0 - пустой слот
+
+# Знаки числового индикатора; в a_counter знак хранится как номер + 1, 0 - конец строки
+GLYPHS = '0123456789?X'
+COUNTER_BITS = 4
+COUNTER_LENGTH = 5  # больше не помещается в float без потерь
+
+
+vertex_source = """#version 330 core
+in vec4 a_cell;
+in vec4 a_sensor;
+in vec3 a_port;
+in float a_links;
+in float a_counter;
+
+out vec2 v_local;
+flat out int v_body;
+flat out int v_flags;
+flat out int v_sides;
+flat out int v_counter;
+flat out vec4 v_sensor;
+flat out vec3 v_port;
+
+uniform WindowBlock
+{
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform float u_tile;
+
+const vec2 CORNERS[4] = vec2[4](vec2(0.0, 0.0), vec2(1.0, 0.0), vec2(0.0, 1.0), vec2(1.0, 1.0));
+
+void main()
+{
+    v_flags = int(a_cell.w);
+    if ((v_flags & %(VISIBLE)d) == 0) {
+        // Пустой слот: все вершины в одной точке за экраном
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        return;
+    }
+    v_local = CORNERS[gl_VertexID] * u_tile;
+    v_body = int(a_cell.z);
+    v_sides = int(a_links);
+    v_counter = int(a_counter);
+    v_sensor = a_sensor;
+    v_port = a_port;
+    gl_Position = window.projection * window.view * vec4(a_cell.xy * u_tile + v_local, 0.0, 1.0);
+}
+"""
+
+fragment_source = """#version 330 core
+in vec2 v_local;
+flat in int v_body;
+flat in int v_flags;
+flat in int v_sides;
+flat in int v_counter;
+flat in vec4 v_sensor;
+flat in vec3 v_port;
+
+out vec4 final_colors;
+
+uniform sampler2D u_masks;
+uniform sampler2D u_glyphs;
+uniform int u_mask_columns;
+uniform float u_tile;
+uniform float u_ghost;
+uniform bool u_pie;      // круговой индикатор заряда, иначе число
+
+const float PI = 3.14159265;
+const int ADVANCE[%(GLYPH_COUNT)d] = int[%(GLYPH_COUNT)d](%(ADVANCE)s);
+const ivec4 BOX[%(GLYPH_COUNT)d] = ivec4[%(GLYPH_COUNT)d](%(BOX)s);       // от пера: x, y, ширина, высота
+const ivec2 ORIGIN[%(GLYPH_COUNT)d] = ivec2[%(GLYPH_COUNT)d](%(ORIGIN)s);  // слот в атласе глифов
+%(COMMON)s
+vec4 mask(int sides, ivec2 pixel)
+{
+    ivec2 origin = ivec2(sides %% u_mask_columns, sides / u_mask_columns) * u_stride;
+    return texelFetch(u_masks, origin + pixel, 0);
+}
+
+bool inside(vec2 p, float low, float high)
+{
+    return all(greaterThanEqual(p, vec2(low))) && all(lessThan(p, vec2(high)));
+}
+
+void main()
+{
+    vec2 p = v_local;
+    float t = u_tile;
+
+    vec4 color = vec4(0.0);
+    if (inside(p, %(PAD)s, t - %(PAD)s))
+        color = vec4(0.0, 0.0, 0.0, 1.0);
+
+    if (u_pie) {
+        vec2 d = p - vec2(t / 2.0);
+        float angle = atan(d.x, d.y);
+        if (angle < 0.0)
+            angle += 2.0 * PI;
+        float power = (v_flags & %(HIDDEN)d) != 0 ? 1.0 : v_sensor.a;
+        if (angle <= power * 2.0 * PI) {
+            float edge = 1.0 - smoothstep(%(RADIUS)s - 0.5, %(RADIUS)s + 0.5, length(d));
+            color = over(color, vec4(v_sensor.rgb, edge));
+        }
+    }
+
+    // Рамка порта лежит поверх индикатора
+    if ((v_flags & %(PORT)d) != 0 && inside(p, %(RING_OUT)s, t - %(RING_OUT)s) && !inside(p, %(RING_IN)s, t - %(RING_IN)s))
+        color = over(color, vec4(v_port, 1.0));
+
+    ivec2 pixel = ivec2(floor(p));
+    color = over(color, source(v_body, pixel));
+    if (v_sides != 0)
+        color = over(color, mask(v_sides, pixel));
+
+    if ((v_flags & %(GHOST)d) != 0)
+        color.a *= u_ghost;
+
+    // Число поверх клетки: глифы строки по центру, цвет владельца.
+    // Глифы вдвое крупнее клетки, пиксель - среднее четырёх текселей
+    if (!u_pie && v_counter != 0) {
+        int width = 0;
+        for (int c = v_counter; c != 0; c >>= %(COUNTER_BITS)d)
+            width += ADVANCE[(c & %(COUNTER_MASK)d) - 1];
+        ivec2 pen = ivec2(int(t) - width / 2, %(BASELINE)d);
+        for (int c = v_counter; c != 0; c >>= %(COUNTER_BITS)d) {
+            int glyph = (c & %(COUNTER_MASK)d) - 1;
+            float alpha = 0.0;
+            for (int i = 0; i < 4; i++) {
+                ivec2 texel = pixel * 2 + ivec2(i & 1, i >> 1) - pen - BOX[glyph].xy;
+                if (all(greaterThanEqual(texel, ivec2(0))) && all(lessThan(texel, BOX[glyph].zw)))
+                    alpha += texelFetch(u_glyphs, ORIGIN[glyph] + texel, 0).a;
+            }
+            color = over(color, vec4(v_sensor.rgb, alpha / 4.0));
+            pen.x += ADVANCE[glyph];
+        }
+    }
+
+    if (color.a <= 0.0)
+        discard;
+    final_colors = color;
+}
+"""
+
+# Общее для шейдеров: наложение с прямой альфой и чтение картинки из атласа
+common_source = """
+uniform sampler2D u_source;
+uniform int u_columns;
+uniform int u_stride;
+
+vec4 over(vec4 dst, vec4 src)
+{
+    float a = src.a + dst.a * (1.0 - src.a);
+    if (a <= 0.0)
+        return vec4(0.0);
+    return vec4((src.rgb * src.a + dst.rgb * dst.a * (1.0 - src.a)) / a, a);
+}
+
+vec4 source(int slot, ivec2 pixel)
+{
+    ivec2 origin = ivec2(slot % u_columns, slot / u_columns) * u_stride;
+    return texelFetch(u_source, origin + pixel, 0);
+}
+"""
+
+# Склейка картинок сторон по всем маскам: экземпляр - маска, квадрат - её слот в атласе масок
+mask_vertex_source = """#version 330 core
+flat out int v_sides;
+flat out ivec2 v_origin;
+
+uniform int u_mask_columns;
+uniform int u_stride;
+uniform float u_page;
+uniform float u_tile;
+
+const vec2 CORNERS[4] = vec2[4](vec2(0.0, 0.0), vec2(1.0, 0.0), vec2(0.0, 1.0), vec2(1.0, 1.0));
+
+void main()
+{
+    v_sides = gl_InstanceID;
+    v_origin = ivec2(v_sides %% u_mask_columns, v_sides / u_mask_columns) * u_stride;
+    vec2 p = vec2(v_origin) + CORNERS[gl_VertexID] * u_tile;
+    gl_Position = vec4(p / u_page * 2.0 - 1.0, 0.0, 1.0);
+}
+"""
+
+mask_fragment_source = """#version 330 core
+flat in int v_sides;
+flat in ivec2 v_origin;
+
+out vec4 final_colors;
+
+const int SIDES[%(SIDE_COUNT)d] = int[%(SIDE_COUNT)d](%(SIDES)s);
+%(COMMON)s
+void main()
+{
+    ivec2 pixel = ivec2(gl_FragCoord.xy) - v_origin;
+    vec4 color = vec4(0.0);
+    for (int i = 0; i < %(SIDE_COUNT)d; i++) {
+        if ((v_sides & SIDES[i]) == SIDES[i])
+            color = over(color, source(%(BODY_COUNT)d + i, pixel));
+    }
+    final_colors = color;
+}
+"""
+
+wall_vertex_source = """#version 330 core
+in vec3 a_edge;
+
+uniform WindowBlock
+{
+    mat4 projection;
+    mat4 view;
+} window;
+
+uniform float u_tile;
+uniform float u_margin;
+
+const vec2 CORNERS[4] = vec2[4](vec2(0.0, 0.0), vec2(1.0, 0.0), vec2(0.0, 1.0), vec2(1.0, 1.0));
+
+void main()
+{
+    int kind = int(a_edge.z);
+    if (kind == 0) {
+        gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+        return;
+    }
+    // Брус толщиной в пад вдоль ребра, с заходом на полпада за оба конца
+    vec2 size = kind == %(HORIZONTAL)d ? vec2(u_tile + 2.0 * u_margin, 2.0 * u_margin)
+                                       : vec2(2.0 * u_margin, u_tile + 2.0 * u_margin);
+    vec2 position = a_edge.xy * u_tile - vec2(u_margin) + CORNERS[gl_VertexID] * size;
+    gl_Position = window.projection * window.view * vec4(position, 0.0, 1.0);
+}
+"""
+
+wall_fragment_source = """#version 330 core
+out vec4 final_colors;
+
+uniform vec3 u_wall;
+
+void main()
+{
+    final_colors = vec4(u_wall, 1.0);
+}
+"""
+
+
+class Instances:
+    """Буфер атрибутов экземпляров одного квадрата, поделённый на слоты.
+
+    Запись в слот меняет только массив, на видеокарту перед кадром уходит
+    диапазон изменённых слотов. Освобождённый слот обнуляется и выдаётся снова.
+    """
+    CAPACITY = 64
+
+    def __init__(self, program, attributes):
+        self.stride = sum(count for _, count in attributes)
+        self.allocator = SlotAllocator()
+        self.capacity = self.CAPACITY
+        self.data = array('f', bytes(4 * self.stride * self.capacity))
+        self._dirty = None  # (первый, последний + 1) изменённые экземпляры
+        self._resized = True
+        self.buffer = BufferObject(self.data.itemsize * len(self.data))
+        self.vao = VertexArray()
+        self._bind_attributes(program, attributes)
+
+    def _bind_attributes(self, program, attributes):
+        self.vao.bind()
+        self.buffer.bind()
+        size = self.data.itemsize
+        offset = 0
+        for name, count in attributes:
+            location = program.attributes[name]['location']
+            gl.glEnableVertexAttribArray(location)
+            gl.glVertexAttribPointer(location, count, gl.GL_FLOAT, False, self.stride * size, offset * size)
+            gl.glVertexAttribDivisor(location, 1)
+            offset += count
+        self.vao.unbind()
+
+    def allocate(self):
+        slot = self.allocator.allocate()
+        if slot >= self.capacity:
+            old = self.capacity
+            while slot >= self.capacity:
+                self.capacity *= 2
+            self.data.frombytes(bytes(4 * self.stride * (self.capacity - old)))
+            self._resized = True
+        return slot
+
+    def release(self, slot):
+        self.data[slot * self.stride:(slot + 1) * self.stride] = array('f', bytes(4 * self.stride))
+        self._touch(slot)
+        self.allocator.release(slot)
+
+    def _touch(self, slot):
+        dirty = self._dirty
+        if dirty is None:
+            self._dirty = slot, slot + 1
+        elif not dirty[0] <= slot < dirty[1]:
+            self._dirty = min(dirty[0], slot), max(dirty[1], slot + 1)
+
+    def _write(self, slot, offset, values):
+        start = slot * self.stride + offset
+        self.data[start:start + len(values)] = array('f', values)
+        self._touch(slot)
+
+    def upload(self):
+        if self._resized:
+            # Буфер пересоздаётся целиком, старое содержимое не копируется
+            self.buffer.size = self.data.itemsize * len(self.data)
+            self.buffer.set_data(ctypes.c_void_p(self.data.buffer_info()[0]))
+            self._resized = False
+        elif self._dirty is not None:
+            first, last = self._dirty
+            size = self.data.itemsize * self.stride
+            address = self.data.buffer_info()[0] + first * size
+            self.buffer.set_data_region(ctypes.c_void_p(address), first * size, (last - first) * size)
+        self._dirty = None
+
+    def draw(self):
+        self.vao.bind()
+        gl.glDrawArraysInstanced(gl.GL_TRIANGLE_STRIP, 0, 4, self.allocator.top)
+
+    def __len__(self):
+        return len(self.allocator)
+
+
+class Chunk(Instances):
+    """Экземпляры клеток одного квадрата CHUNK x CHUNK доски.
+
+    У чанка свой буфер экземпляров, поэтому чанк
+    за экраном не рисуется и не выгружается на видеокарту. Обновления
+    видов его клеток откладываются в stale до появления чанка на экране.
+
+    Для мелкого масштаба у чанка есть текстура size x size, по текселю
+    на клетку: цвет владельца, яркость по заряду. На видеокарту уходит
+    только прямоугольник изменённых текселей.
+    """
+    EMPTY = (96, 96, 96)  # тексель клетки без индикатора
+
+    def __init__(self, key, program, size):
+        super().__init__(program, ATTRIBUTES)
+        self.key = key
+        self.size = size
+        self.shown = True
+        self.stale = set()
+        self.texels = bytearray(4 * size * size)
+        self.lod = None         # спрайт текстуры мелкого масштаба, создаётся при первом показе
+        self._lod_dirty = None  # x0, y0, x1, y1 изменённых текселей
+
+    def release(self, slot):
+        self._texel(slot, (0, 0, 0), 0)
+        super().release(slot)
+
+    def place(self, slot, position, body, port=None):
+        row, col = position
+        flags = VISIBLE | (PORT if port is not None else 0)
+        self._write(slot, OFFSET['a_cell'], (col, row, body, flags))
+        if port is not None:
+            self._write(slot, OFFSET['a_port'], [c / 255 for c in port[:3]])
+        self._texel(slot, self.EMPTY)
+
+    def sensor(self, slot, color, power):
+        self._write(slot, OFFSET['a_sensor'], (*(c / 255 for c in color[:3]), power))
+        shade = 0.35 + 0.65 * min(power, 1)
+        self._texel(slot, [int(c * shade) for c in color[:3]])
+
+    def _texel(self, slot, color, alpha=255):
+        col, row = self.data[slot * STRIDE:slot * STRIDE + 2]
+        x, y = int(col) - self.key[1] * self.size, int(row) - self.key[0] * self.size
+        start = 4 * (y * self.size + x)
+        self.texels[start:start + 4] = bytes((*color, alpha))
+        dirty = self._lod_dirty
+        if dirty is None:
+            self._lod_dirty = x, y, x + 1, y + 1
+        else:
+            self._lod_dirty = min(dirty[0], x), min(dirty[1], y), max(dirty[2], x + 1), max(dirty[3], y + 1)
+
+    def links(self, slot, sides):
+        self._write(slot, OFFSET['a_links'], (sides,))
+
+    def counter(self, slot, text):
+        """Строка числового индикатора из знаков GLYPHS"""
+        code = 0
+        for i, char in enumerate(text[:COUNTER_LENGTH]):
+            code |= (GLYPHS.index(char) + 1) << i * COUNTER_BITS
+        self._write(slot, OFFSET['a_counter'], (code,))
+
+    def flag(self, slot, flag, value):
+        index = slot * STRIDE + FLAGS
+        flags = int(self.data[index])
+        flags = flags | flag if value else flags & ~flag
+        if flags != self.data[index]:
+            self.data[index] = flags
+            self._touch(slot)
+
+    def show(self):
+        """Чанк снова на экране: догнать отложенные обновления видов"""
+        self.shown = True
+        if self.lod is not None:
+            self.lod.visible = True
+        stale, self.stale = self.stale, set()
+        with TIMINGS.measure('cells.update'):
+            for view in stale:
+                view.refresh()
+
+    def hide(self):
+        """Чанк ушёл с экрана: его спрайт мелкого масштаба не рисуется вместе с lod_batch"""
+        self.shown = False
+        if self.lod is not None:
+            self.lod.visible = False
+
+    def upload_lod(self, tile, batch):
+        if self.lod is None:
+            texture = pyglet.image.Texture.create(self.size, self.size,
+                                                  min_filter=gl.GL_NEAREST, mag_filter=gl.GL_NEAREST)
+            row, col = self.key
+            self.lod = Sprite(texture, col * self.size * tile, row * self.size * tile, batch=batch)
+            self.lod.scale = tile
+            self._lod_dirty = 0, 0, self.size, self.size
+        if self._lod_dirty is None:
+            return
+        x0, y0, x1, y1 = self._lod_dirty
+        texture = self.lod.image
+        pixels = (ctypes.c_ubyte * len(self.texels)).from_buffer(self.texels)
+        gl.glBindTexture(texture.target, texture.id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, self.size)
+        gl.glTexSubImage2D(texture.target, 0, x0, y0, x1 - x0, y1 - y0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE,
+                           ctypes.byref(pixels, 4 * (y0 * self.size + x0)))
+        gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, 0)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        self._lod_dirty = None
+
+
+class WallMesh(Instances):
+    """Стены всей доски, по экземпляру на ребро сетки.
+
+    Стена на общем ребре двух клеток - один экземпляр со счётчиком клеток,
+    которые её требуют. Меняются только рёбра, у которых стена появилась
+    или пропала, поэтому число экземпляров не растёт от перерисовок.
+    """
+
+    def __init__(self, program):
+        super().__init__(program, WALL_ATTRIBUTES)
+        self.edges = dict()  # (колонка, строка, направление) -> [слот, число клеток]
+
+    @staticmethod
+    def _edges(position, walls):
+        row, col = position
+        if walls & N:
+            yield col, row + 1, HORIZONTAL
+        if walls & E:
+            yield col + 1, row, VERTICAL
+        if walls & S:
+            yield col, row, HORIZONTAL
+        if walls & W:
+            yield col, row, VERTICAL
+
+    def change(self, position, old, new):
+        """Маска стен клетки сменилась с old на new"""
+        for edge in self._edges(position, old & ~new):
+            entry = self.edges[edge]
+            entry[1] -= 1
+            if not entry[1]:
+                self.release(entry[0])
+                del self.edges[edge]
+        for edge in self._edges(position, new & ~old):
+            entry = self.edges.get(edge)
+            if entry is None:
+                slot = self.allocate()
+                self.edges[edge] = [slot, 1]
+                self._write(slot, 0, edge)
+            else:
+                entry[1] += 1
+
+
+class BoardRenderer:
+    """Клетки доски как экземпляры одного квадрата, по чанкам.
+
+    Вид клетки держит номер экземпляра в своём чанке и пишет в его атрибуты
+    владельца, заряд, число и маску сторон. Изменение - это запись нескольких
+    чисел в массив, в буфер видеокарты перед кадром уходит только изменённый
+    диапазон видимых чанков. Картинки тел лежат в атласе, стороны - в атласе
+    масок, склеенном заранее; шейдер собирает из них клетку. Стены всей
+    доски - одна сетка рёбер walls, она рисуется под клетками.
+
+    Стиль индикатора pie (круг или число) общий для всех клеток и переключается
+    без перерисовки видов: у каждой клетки уже записаны и заряд, и число.
+    """
+    CHUNK = 32       # клеток по стороне чанка
+    LOD_ZOOM = 0.25  # мельче - чанк рисуется одной текстурой, по текселю на клетку
+
+    def __init__(self, tile, pad, bodies, sides, side_masks, font, wall=(48, 24, 7), ghost=192, pie=True):
+        self.tile = tile
+        self.pad = pad
+        self.margin = pad / 2  # стены выходят за клетку на полпада
+        self.wall = wall
+        self.ghost = ghost
+        self.pie = pie
+        self.chunks = dict()
+        self.shown = set()     # чанки, попавшие на экран в прошлом кадре
+        self.lod_batch = Batch()
+
+        images = [*bodies, *sides]
+        self.atlas = RenderAtlas(tile, tile, page=self._page(tile, len(images)), pixel=True)
+        for image in images:
+            self.atlas.upload(self.atlas.allocate(), image)
+        self.glyphs, glyph_values = self._glyphs(font)
+        values = self._values(len(bodies), side_masks)
+        values.update(glyph_values)
+        self.masks = self._masks(values, side_masks)
+        self.program = pyglet.gl.current_context.create_program((vertex_source % values, 'vertex'),
+                                                                (fragment_source % values, 'fragment'))
+        self.wall_program = pyglet.gl.current_context.create_program(
+            (wall_vertex_source % dict(HORIZONTAL=HORIZONTAL), 'vertex'), (wall_fragment_source, 'fragment'))
+        self.walls = WallMesh(self.wall_program)
+
+    @staticmethod
+    def _page(tile, count):
+        page = 64
+        while (page // (tile + RenderAtlas.GAP)) ** 2 < count:
+            page *= 2
+        return page
+
+    def _values(self, body_count, side_masks):
+        pad = self.pad
+        return dict(VISIBLE=VISIBLE, HIDDEN=HIDDEN, GHOST=GHOST, PORT=PORT,
+                    BODY_COUNT=body_count, COMMON=common_source,
+                    SIDE_COUNT=len(side_masks), SIDES=', '.join(map(str, side_masks)),
+                    PAD=float(pad), RING_OUT=float(pad - 4), RING_IN=float(pad + 6),
+                    RADIUS=float(self.tile / 3))
+
+    def _glyphs(self, font):
+        """Атлас знаков GLYPHS шрифта font и их размеры для шейдера.
+
+        Шрифт берётся вдвое крупнее числа на клетке, размеры - в половинных пикселях.
+        """
+        glyphs = font.get_glyphs(GLYPHS)[0]
+        glyph_atlas = RenderAtlas(max(glyph.width for glyph in glyphs), max(glyph.height for glyph in glyphs),
+                                  page=self._page(font.ascent - font.descent, len(glyphs)), pixel=True)
+        origins = []
+        for glyph in glyphs:
+            slot = glyph_atlas.allocate()
+            image = glyph.get_image_data()
+            if glyph.tex_coords[1] > glyph.tex_coords[7]:
+                # Глиф лежит в текстуре шрифта вверх ногами, его разворачивают координаты текстуры
+                image = ImageData(image.width, image.height, 'RGBA', image.get_data('RGBA', -image.width * 4))
+            glyph_atlas.upload(slot, image)
+            origins.append(glyph_atlas.origin(slot)[1:])
+        # Базовая линия как у однострочной Label с anchor_y='center', поднятой на пиксель
+        baseline = self.tile + 2 + font.ascent // 2 - font.descent // 4 - font.ascent
+        values = dict(GLYPH_COUNT=len(glyphs), BASELINE=baseline,
+                      COUNTER_BITS=COUNTER_BITS, COUNTER_MASK=(1 << COUNTER_BITS) - 1,
+                      ADVANCE=', '.join(str(glyph.advance) for glyph in glyphs),
+                      BOX=', '.join('ivec4(%d, %d, %d, %d)' % (*glyph.vertices[:2], glyph.width, glyph.height)
+                                    for glyph in glyphs),
+                      ORIGIN=', '.join('ivec2(%d, %d)' % origin for origin in origins))
+        return glyph_atlas, values
+
+    def _masks(self, values, side_masks):
+        """Атлас, где слот с номером маски сторон - уже наложенные картинки этих сторон.
+
+        Склеивается один раз, одним инстансным вызовом на видеокарте,
+        дальше клетка берёт свои стороны одним чтением по маске.
+        """
+        count = 1 << max(side_masks).bit_length()
+        masks = RenderAtlas(self.tile, self.tile, page=self._page(self.tile, count), pixel=True)
+        for sides in range(count):
+            masks.allocate()
+
+        program = pyglet.gl.current_context.create_program((mask_vertex_source % values, 'vertex'),
+                                                           (mask_fragment_source % values, 'fragment'))
+        program.use()
+        program['u_source'] = 0
+        program['u_columns'] = self.atlas.columns
+        program['u_mask_columns'] = masks.columns
+        program['u_stride'] = self.tile + RenderAtlas.GAP
+        program['u_page'] = float(masks.page)
+        program['u_tile'] = float(self.tile)
+        texture = self.atlas.pages[0][0]
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glBindTexture(texture.target, texture.id)
+        blend = gl.glIsEnabled(gl.GL_BLEND)
+        gl.glDisable(gl.GL_BLEND)
+        vao = VertexArray()
+        vao.bind()
+        with masks.target_page(0):
+            gl.glDrawArraysInstanced(gl.GL_TRIANGLE_STRIP, 0, 4, count)
+        vao.unbind()
+        if blend:
+            gl.glEnable(gl.GL_BLEND)
+        program.stop()
+        program.delete()
+        return masks
+
+    def chunk(self, position):
+        row, col = position
+        key = row // self.CHUNK, col // self.CHUNK
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = Chunk(key, self.program, self.CHUNK)
+            self.shown.add(chunk)
+        return chunk
+
+    def visible(self, bounds=None):
+        """Чанки, пересекающие область left, bottom, right, top в мировых координатах"""
+        if bounds is None:
+            return list(self.chunks.values())
+        left, bottom, right, top = bounds
+        size = self.CHUNK * self.tile
+        rows = range(floor(bottom / size), floor(top / size) + 1)
+        cols = range(floor(left / size), floor(right / size) + 1)
+        if len(rows) * len(cols) <= len(self.chunks):
+            return [self.chunks[key] for key in product(rows, cols) if key in self.chunks]
+        return [chunk for (row, col), chunk in self.chunks.items() if row in rows and col in cols]
+
+    def _show(self, chunks):
+        shown = set(chunks)
+        for chunk in self.shown - shown:
+            chunk.hide()
+        for chunk in shown - self.shown:
+            chunk.show()
+        self.shown = shown
+
+    def draw(self, bounds=None, zoom=1.0):
+        """Нарисовать чанки, видимые в bounds, без bounds - все"""
+        chunks = [chunk for chunk in self.visible(bounds) if chunk.allocator.top]
+        self._show(chunks)
+        if not chunks:
+            return
+        if zoom < self.LOD_ZOOM:
+            self.draw_lod(chunks)
+            return
+        with TIMINGS.measure('cells.upload'):
+            for chunk in chunks:
+                chunk.upload()
+            self.walls.upload()
+
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        if self.walls.allocator.top:
+            # Стены раньше клеток: брус на краю клетки уходит под соседа
+            program = self.wall_program
+            program.use()
+            program['u_tile'] = float(self.tile)
+            program['u_margin'] = float(self.margin)
+            program['u_wall'] = tuple(c / 255 for c in self.wall)
+            self.walls.draw()
+
+        program = self.program
+        program.use()
+        program['u_tile'] = float(self.tile)
+        program['u_columns'] = self.atlas.columns
+        program['u_mask_columns'] = self.masks.columns
+        program['u_stride'] = self.tile + self.atlas.GAP
+        program['u_source'] = 0
+        program['u_masks'] = 1
+        program['u_glyphs'] = 2
+        program['u_ghost'] = self.ghost / 255
+        program['u_pie'] = self.pie
+        for unit, atlas in enumerate((self.atlas, self.masks, self.glyphs)):
+            texture = atlas.pages[0][0]
+            gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+            gl.glBindTexture(texture.target, texture.id)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        for chunk in chunks:
+            chunk.draw()
+        gl.glBindVertexArray(0)
+        gl.glDisable(gl.GL_BLEND)
+        program.stop()
+
+    def draw_lod(self, chunks):
+        with TIMINGS.measure('cells.upload'):
+            for chunk in chunks:
+                chunk.upload_lod(self.tile, self.lod_batch)
+        self.lod_batch.draw()
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.chunks.values())
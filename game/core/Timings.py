@@ -0,0 +1,84 @@
+"""Скользящие замеры времени подсистем для оверлея отладки"""
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from time import perf_counter, time
+import json
+
+
+class Timings:
+    """Последние SIZE замеров для каждого имени и их p50/p99.
+
+    Замер - это одно добавление в deque, проценти считаются только
+    при запросе отчёта. Сетевой поток пишет сюда же, поэтому под замком.
+    """
+    SIZE = 512
+
+    def __init__(self, size=None):
+        self.size = size or self.SIZE
+        self.enabled = True
+        self.samples = defaultdict(self._window)
+        self._lock = Lock()
+
+    def _window(self):
+        return deque(maxlen=self.size)
+
+    def add(self, name, seconds):
+        if self.enabled:
+            with self._lock:
+                self.samples[name].append(seconds)
+
+    @contextmanager
+    def measure(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - start)
+
+    def timed(self, name):
+        """Декоратор: замер каждого вызова функции под именем name"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(name, perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def copy(self):
+        with self._lock:
+            return {name: list(window) for name, window in self.samples.items() if window}
+
+    @staticmethod
+    def stats(samples):
+        samples = sorted(samples)
+        def pick(q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+        return {'count': len(samples), 'p50': pick(0.5), 'p99': pick(0.99), 'max': samples[-1]}
+
+    def report(self):
+        return {name: self.stats(samples) for name, samples in sorted(self.copy().items())}
+
+    def overlay(self):
+        return '\n'.join(f'{name}: p50 {s["p50"] * 1000:.2f}ms p99 {s["p99"] * 1000:.2f}ms max {s["max"] * 1000:.2f}ms'
+                         for name, s in self.report().items())
+
+    def dump(self, path):
+        samples = self.copy()
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'time': time(),
+                       'report': {name: self.stats(s) for name, s in samples.items()},
+                       'samples': samples}, file, indent=4)
+        return path
+
+    def clear(self):
+        with self._lock:
+            self.samples.clear()
+
+
+TIMINGS = Timings()
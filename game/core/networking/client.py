@@ -11,6 +11,7 @@ from collections import deque
 import logging
 from pyglet.event import EventDispatcher
 from .server import Protocol
+from ..Timings import TIMINGS
 from hashlib import sha256
 
 logging.basicConfig(level=logging.INFO)
@@ -105,8 +106,9 @@ class NetClient(EventDispatcher):
                             logging.info("Получены пустые данные: соединение закрыто")
                             self.dispatch_event("on_disconnect")
                             break
-                        update = json.loads(data)
-                        self.dispatch_event("on_receive", update)
+                        with TIMINGS.measure('net.client'):
+                            update = json.loads(data)
+                            self.dispatch_event("on_receive", update)
                         if self.use_queue:
                             self.update_queue.append(update)
 
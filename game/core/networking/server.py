@@ -5,7 +5,9 @@ import json
 from hashlib import sha256
 from enum import Enum
 
-from core.TCGlogic.TCGCell import P_ENERGY, Energy
+from core.TCGlogic.TCGModel import P_ENERGY, Energy
+from core.Timings import TIMINGS
+from time import perf_counter
 from random import shuffle
 
 with open('saves/3x3.json', 'r', encoding='utf-8') as file:
@@ -89,8 +91,10 @@ class NetServer:
                 message = data.decode('utf-8')
                 if not message:
                     continue
+                start = perf_counter()
                 dictionary = json.loads(message)
                 await self.handle_message((client_address, client_port), dictionary)
+                TIMINGS.add('net.server', perf_counter() - start)
         except TimeoutError:
             self.logger.info(f"Клиент {client_address}:{client_port} не отвечает")
         except ConnectionResetError:
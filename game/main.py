@@ -5,7 +5,7 @@ pyglet.options['debug_gl'] = False
 from core.Pyglet.Background import Background
 from pyglet.window.key import KeyStateHandler, symbol_string
 from pyglet.window.mouse import MouseStateHandler
-from core.Pyglet.Camera import ControllableCamera as Camera
+from core.Pyglet.Camera import BoardCamera as Camera
 from core.Settings import Settings, ASSET_DIR
 from core.Pyglet.Actor import Player, MoveableActor as Actor
 from core.Pyglet.Debuger import Debuger
@@ -22,8 +22,8 @@ from core.networking.client import GameClient
 from core.networking.server import Protocol, NetServer
 from core.Pyglet.widgets import Panel, PanelButton, PanelTextButton
 from time import time
-from core.TCGlogic.TCGBoard import GameBoardStateEdit, GameBoardStateWating, GameBoardStateReaction, GameStateAttribute
-from core.TCGlogic.TCGCell import TILE_SIZE, PAD, RULES
+from core.TCGlogic.TCGBoard import GameBoardStateEdit, GameBoardStateReaction, GameStateAttribute
+from core.TCGlogic.TCGCell import TILE_SIZE, PAD, RULES, switch_sensor
 
 import random
 with open('settings/server.json', 'r', encoding='utf-8') as file:
@@ -98,15 +98,8 @@ class HotKeys:
             self.master.back_ground = Background(settings.background, self.master._master)
             self.master.push_handlers(self.master.back_ground)
         elif key == pyglet.window.key.V:
-            if settings.sensor_type:
-                settings.sensor_type = 0
-            else:
-                settings.sensor_type = 1
+            switch_sensor(0 if settings.sensor_type else 1)
             settings.save()
-
-            for cell in self.master.game.cells.values():
-                cell.view.render_sensor()
-                cell.view.update()
                 
         elif key == pyglet.window.key.F:
             if self.master.player.camera is None:
@@ -132,7 +125,7 @@ class HotKeys:
         elif key == pyglet.window.key.E:
             
             if self.master.game.phase() == GSA.EDIT:
-                self.master.game.state = GameBoardStateWating(self.master.game)
+                self.master.game.state.finish()
             elif self.master.game.phase() == GSA.WATING:
                 self.master.game.state = GameBoardStateEdit(self.master.game)
 
@@ -173,7 +166,12 @@ class HotKeys:
             self.master.game.join(*get_players(settings.amount_players))
             
         elif key == pyglet.window.key.Y:
-            self.master.game.state = GameBoardStateReaction(self.master.game)
+            game = self.master.game
+            if game.phase() == GSA.EDIT:
+                # Выход из правки, как по E: индекс и ключ клеток пересчитываются
+                game.state.finish()
+            if game.phase() == GSA.WATING:
+                game.state = GameBoardStateReaction(game)
 
 def create_simple_scheme(r, c):
     scheme = ''
@@ -0,0 +1,178 @@
+"""
+Игры ботов между собой для оценки карт. Запуск, например, из корня проекта:
+
+    python game/self_play.py saves/*.json --games 200 --players random greedy --out self_play.jsonl
+
+Партии играются без окна в пуле процессов, в --out пишется по строке JSON
+на партию, в конце выводится доля побед каждой стратегии на каждой карте.
+"""
+import argparse
+import json
+import random
+from collections import Counter, defaultdict
+from functools import cache
+from multiprocessing import Pool
+from pathlib import Path
+from time import perf_counter
+
+SAVES = Path(__file__).resolve().parent.parent / 'saves'
+
+
+def random_policy(player, cells, rnd):
+    return rnd.choice(cells)
+
+
+def greedy_policy(player, cells, rnd):
+    """Клетка, которая взорвётся и заберёт больше всего чужих соседей, иначе самая заряженная"""
+    from core.TCGlogic.TCGModel import P_ENERGY
+
+    def score(cell):
+        model = cell.model
+        lim = model.lim or 1
+        if model.power + 1 >= lim:
+            # Нейтральные и защищённые клетки не считаются чужими
+            enemies = sum(1 for out in model.outgoing_links if out.owner in P_ENERGY and out.owner != player)
+            return 1 + enemies, rnd.random()
+        return model.power / lim, rnd.random()
+    return max(cells, key=score)
+
+
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+}
+
+
+def setup_worker():
+    import pyglet
+    pyglet.options['headless'] = True
+    pyglet.options['debug_gl'] = False
+
+
+@cache
+def load_map(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+@cache
+def get_board():
+    from core.TCGlogic.TCGBoard import GameBoard
+    return GameBoard(None)
+
+
+def play(task):
+    from core.TCGlogic.TCGBoard import GameStateAttribute as GSA, Modes
+    from core.TCGlogic.TCGHeadless import make_board
+    from core.TCGlogic.TCGModel import P_ENERGY
+
+    path, game, seats, seed, max_moves, replays = task
+    scheme = load_map(path)
+    mode = Modes((scheme.get('meta', {}).get('modes') or [Modes.EXTENDED.value])[0])
+    rnd = random.Random(seed)
+    start = perf_counter()
+
+    board = make_board(scheme, P_ENERGY[:len(seats)], mode, get_board())
+
+    policy = dict(zip(P_ENERGY, seats))
+    moves = waves = cycles = 0
+    while board.phase() == GSA.WATING and moves < max_moves:
+        player = board.players.current()
+        cells = [cell for cell in board.cells.values() if cell.model.hit(owner=player)]
+        if not cells:
+            break
+        row, col = POLICIES[policy[player]](player, cells, rnd).model.position
+        result = board.resolve(row, col)
+        moves += 1
+        waves += result.waves
+        cycles += result.cycle is not None
+
+    if replays is not None:
+        with open(Path(replays) / f'{Path(path).stem}-{game}.json', 'w', encoding='utf-8') as file:
+            json.dump(board.replay.dump(), file)
+
+    finished = board.phase() == GSA.FINISH
+    winner = board.players.winner() if finished else None
+    return {
+        'map': path,
+        'game': game,
+        'seed': seed,
+        'seats': seats,
+        'winner': winner.name if winner else None,
+        'winner_policy': policy[winner] if winner else None,
+        'moves': moves,
+        'waves': waves,
+        'cycles': cycles,
+        'cells': len(board.cells),
+        'hash': f'{board.position_hash():016x}',
+        'seconds': round(perf_counter() - start, 6),
+    }
+
+
+def tasks(maps, games, players, seed, max_moves, replays=None):
+    for path in maps:
+        for game in range(games):
+            # Игроки меняются местами, чтобы порядок хода не искажал статистику
+            shift = game % len(players)
+            seats = players[shift:] + players[:shift]
+            yield path, game, seats, seed * 1_000_003 + game, max_moves, replays
+
+
+def summary(results):
+    games = defaultdict(int)
+    wins = defaultdict(Counter)
+    seated = defaultdict(Counter)
+    moves = defaultdict(list)
+    for r in results:
+        games[r['map']] += 1
+        wins[r['map']][r['winner_policy']] += 1
+        seated[r['map']].update(set(r['seats']))
+        moves[r['map']].append(r['moves'])
+
+    for path in games:
+        lengths = sorted(moves[path])
+        print(f"{path}: партий {games[path]}, ходов в среднем {sum(lengths) / len(lengths):.1f}, "
+              f"медиана {lengths[len(lengths) // 2]}, максимум {lengths[-1]}")
+        for name, count in sorted(seated[path].items()):
+            print(f"  {name:<8} доля побед {wins[path][name] / count:.3f} ({wins[path][name]}/{count})")
+        if wins[path][None]:
+            print(f"  не закончено {wins[path][None]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Игры ботов между собой на картах без окна')
+    parser.add_argument('maps', nargs='*', help='файлы карт, по умолчанию saves/*.json')
+    parser.add_argument('-n', '--games', type=int, default=100, help='партий на карту')
+    parser.add_argument('-p', '--players', nargs='+', default=['random', 'greedy'], choices=POLICIES)
+    parser.add_argument('-j', '--workers', type=int, default=None, help='число процессов, по умолчанию все ядра')
+    parser.add_argument('-o', '--out', default='self_play.jsonl', help='файл JSONL, строка на партию')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-moves', type=int, default=10_000, help='после стольких ходов партия остаётся незаконченной')
+    parser.add_argument('--replays', help='каталог для записей партий, файл на партию')
+    args = parser.parse_args()
+
+    if len(args.players) < 2:
+        parser.error('нужно минимум 2 игрока')
+    maps = args.maps or sorted(str(path) for path in SAVES.glob('*.json'))
+    total = len(maps) * args.games
+    if args.replays:
+        Path(args.replays).mkdir(parents=True, exist_ok=True)
+
+    results = []
+    start = perf_counter()
+    with open(args.out, 'w', encoding='utf-8') as out, \
+         Pool(args.workers, initializer=setup_worker) as pool:
+        for result in pool.imap_unordered(play, tasks(maps, args.games, args.players, args.seed, args.max_moves, args.replays)):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            results.append(result)
+            if len(results) % 100 == 0 or len(results) == total:
+                elapsed = perf_counter() - start
+                print(f'партий {len(results)}/{total}, {len(results) / elapsed:.1f} в секунду')
+
+    summary(results)
+    print(f'партий {total} за {perf_counter() - start:.2f} с, {total / (perf_counter() - start):.1f} в секунду')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,532 @@
+"""Проверки доски без окна. Запуск из корня проекта: python -m unittest discover game/tests"""
+import json
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pyglet
+pyglet.options['headless'] = True
+
+from core.TCGlogic.TCGBoard import (GameBoardStateWating, GameBoardStateReaction,
+                                    GameStateAttribute as GSA, Modes)
+from core.TCGlogic.TCGEngine import ArrayEngine
+from core.TCGlogic.TCGGame import Replay
+from core.TCGlogic.TCGHeadless import scheme, make_board
+from core.TCGlogic.TCGIndex import TerritoryIndex
+from core.TCGlogic.TCGModel import (Energy, RULES, MODEL_TYPE, ProtectedCellModel, LogicCellModel,
+                                    MagicCellModel, VoidCellModel, ModelCell, create_model)
+
+
+def engines(test):
+    """Прогнать проверку на волнах ArrayEngine и на волнах моделей"""
+    def run(self):
+        try:
+            for GameBoardStateReaction.ENGINE in (True, False):
+                with self.subTest(engine=GameBoardStateReaction.ENGINE):
+                    test(self)
+        finally:
+            GameBoardStateReaction.ENGINE = True
+    return run
+
+
+class FrontierWaves(unittest.TestCase):
+    """Волна проходит по фронту, а не по всей доске, как было до него"""
+    PROTECTED = MODEL_TYPE.index(ProtectedCellModel)
+    LOGIC = MODEL_TYPE.index(LogicCellModel)
+
+    @engines
+    def test_logic_keeps_leftover_power(self):
+        # Раньше каждая волна вызывала reaction() у всех клеток и сбрасывала заряд
+        # нейтральной логической клетки. Вне фронта заряд остаётся до следующей зарядки
+        data = scheme([(0, 0), (0, 1), (0, 3), (0, 4), (1, 3)], [(0, 1, 2), (2, 3, 2), (2, 4, 2)],
+                      {(0, 1): self.LOGIC})
+        board = make_board(data)
+        logic = board.cells[(0, 1)].model
+        logic.power = 1
+        board.rehash()
+
+        result = board.resolve(0, 3)
+        self.assertEqual(result.waves, 1)
+        self.assertEqual((logic.owner, logic.power), (Energy.NEUTRAL, 1))
+
+    @engines
+    def test_protected_without_links(self):
+        # Защищённая клетка без исходящих связей всегда полная: предел 0, владелец OTHER.
+        # Раньше из-за неё любая реакция не заканчивалась, вне фронта она не проверяется
+        data = scheme([(0, 0), (0, 1), (1, 0), (0, 3)], [(0, 1, 2), (0, 2, 2)], {(0, 3): self.PROTECTED})
+        board = make_board(data)
+        self.assertTrue(board.cells[(0, 3)].model.is_full())
+
+        result = board.resolve(0, 0)
+        self.assertEqual(result.waves, 1)
+        self.assertIsNone(result.cycle)
+        self.assertEqual(board.phase(), GSA.WATING)
+        self.assertEqual({cell.model.position for cell in result.touched}, {(0, 0)})
+
+
+class UnstableAfterEdit(unittest.TestCase):
+    # Две пары клеток, связанных в обе стороны: взрыв в паре зацикливается
+    DATA = scheme([(0, 0), (1, 0), (0, 3), (1, 3)], [(0, 1, 2), (2, 3, 2)])
+
+    def test_delete_after_loop(self):
+        board = make_board(self.DATA)
+        result = board.resolve(0, 0)
+        self.assertIsNotNone(result.cycle)
+        self.assertTrue(board.unstable)
+
+        # Правка доски: клетку удаляют так же, как DeleteCell редактора
+        for cell in list(board.unstable):
+            board.cells.pop(cell.model.position).delete()
+        board.engine = None
+        board.state = GameBoardStateWating(board)
+
+        result = board.resolve(0, 3)
+        self.assertIsNotNone(result)
+        self.assertNotEqual(board.phase(), GSA.REACTION)
+        self.assertFalse(any(cell.model.index is None for cell in result.touched))
+
+
+@unittest.skipUnless(ArrayEngine.available(), "ArrayEngine требует numpy")
+class EngineMatchesModels(unittest.TestCase):
+    """Волны ArrayEngine и волны моделей дают одну и ту же доску на каждом типе клеток"""
+    SIDE = 6
+    MOVES = 40
+    PLAYERS = Energy.P1, Energy.P2, Energy.P3
+    SEED = 33  # при нём на карте каждого типа есть многоволновые реакции
+
+    def data(self, tc, rnd):
+        # Каждая третья клетка по диагоналям - типа tc, связи сетки и несколько случайных
+        cells = [(row, col) for row in range(self.SIDE) for col in range(self.SIDE)]
+        types = {(row, col): tc for row, col in cells if (row + col) % 3 == 0}
+        links = []
+        for i, (row, col) in enumerate(cells):
+            if col + 1 < self.SIDE:
+                links.append((i, i + 1, rnd.choice((0, 1, 2, 2, 2))))
+            if row + 1 < self.SIDE:
+                links.append((i, i + self.SIDE, rnd.choice((0, 1, 2, 2, 2))))
+        links += [(rnd.randrange(len(cells)), rnd.randrange(len(cells)), 0) for _ in range(self.SIDE)]
+        return scheme(cells, links, types)
+
+    def test_cell_types(self):
+        insular = RULES.BLOCK_INSULAR
+        try:
+            for tc in range(len(MODEL_TYPE)):
+                for RULES.BLOCK_INSULAR in (0, 1):
+                    with self.subTest(tc=tc, insular=RULES.BLOCK_INSULAR):
+                        self.play(tc)
+        finally:
+            RULES.BLOCK_INSULAR = insular
+            GameBoardStateReaction.ENGINE = True
+
+    def test_cut_cascade(self):
+        # Реакция, прерванная на max_waves, уже записана в модели и в наборы индекса
+        data = self.data(0, random.Random(self.SEED))
+        states = {}
+        for engine in (True, False):
+            GameBoardStateReaction.ENGINE = engine
+            board = make_board(data)
+            for cell in board.cells.values():
+                cell.model.owner = Energy.P1
+                cell.model.power = cell.model.lim - 1
+            board.index.rebuild(board.cells.values())
+            board.rehash()
+            result = board.resolve(0, 0, max_waves=3)
+            self.assertEqual(result.phase, GSA.REACTION)
+
+            rebuilt = TerritoryIndex()
+            rebuilt.rebuild(board.cells.values())
+            for model in board.index.models:
+                model.index = board.index
+            self.assertEqual(+board.index.owned, +rebuilt.owned)
+            self.assertEqual({owner: cells for owner, cells in board.index.cells.items() if cells},
+                             {owner: cells for owner, cells in rebuilt.cells.items() if cells})
+            key = board.zobrist
+            self.assertEqual(key, board.rehash())
+            states[engine] = [(cell.model.owner_id, cell.model.power) for cell in board.cells.values()]
+        GameBoardStateReaction.ENGINE = True
+        self.assertEqual(states[True], states[False])
+
+    @staticmethod
+    def choose(board, rnd):
+        # Игрок то заряжает свои клетки, то берёт новую, засчитываемую ему
+        RULES.context(board)
+        player = board.players.current()
+        moves = sorted(position for position, cell in board.cells.items() if board.state.hover(*position))
+        own = [position for position in moves if board.cells[position].model.owner == player]
+        # Нейтральную логическую клетку нажатием не взять, она только принимает заряд
+        counted = [position for position in moves if board.cells[position].model.CONSIDERED
+                   and not isinstance(board.cells[position].model, LogicCellModel)]
+        return rnd.choice(own if own and rnd.random() < 0.6 else counted or moves)
+
+    def play(self, tc):
+        rnd = random.Random(self.SEED + tc)
+        data = self.data(tc, rnd)
+        boards = {engine: make_board(data, self.PLAYERS) for engine in (True, False)}
+        objects = boards[False]
+        cascades = 0
+        for move in range(self.MOVES):
+            if objects.phase() != GSA.WATING:
+                break
+            row, col = self.choose(objects, rnd)
+            results = {}
+            for engine, board in boards.items():
+                GameBoardStateReaction.ENGINE = engine
+                RULES.context(board)
+                results[engine] = board.resolve(row, col)
+            state = {engine: (board.phase(), board.players.queue(),
+                              [(cell.model.owner_id, cell.model.power) for cell in board.cells.values()])
+                     for engine, board in boards.items()}
+            self.assertEqual(state[True], state[False], f'ход {move}: {row} {col}')
+            self.assertEqual(results[True].waves, results[False].waves)
+            cascades += results[False].waves > 1
+        self.assertIsNotNone(boards[True].engine)
+        self.assertGreater(cascades, 0)
+
+
+class LeaveEdit(unittest.TestCase):
+    DATA = UnstableAfterEdit.DATA
+
+    def test_rehash(self):
+        board = make_board(self.DATA)
+        board.resolve(0, 0)
+        topology = board.index.topology
+
+        # Правка меняет клетки в обход ходов, ключ Зобриста устаревает
+        board.cells.pop((1, 3)).delete()
+        board.cells[(0, 3)].model.power = 1
+        stale = board.zobrist
+        board.edited()
+
+        self.assertGreater(board.index.topology, topology)
+        self.assertNotEqual(board.zobrist, stale)
+
+    def test_recount_ports(self):
+        # Новая тень порта сбрасывает весь порт в NEUTRAL, счётчики индекса должны это увидеть
+        port = MODEL_TYPE.index(MagicCellModel)
+        data = scheme([(0, 0), (0, 1), (1, 0), (1, 1)], [(0, 1, 2), (0, 2, 2), (1, 3, 2)],
+                      {(0, 0): port, (1, 1): port})
+        board = make_board(data)
+        board.resolve(0, 0)
+        self.assertEqual(board.index.owned[Energy.P1], 2)
+
+        cell = ModelCell(create_model(port, (2, 0), board.ports))
+        board.cells[(2, 0)] = cell
+        board.index.attach(cell.model)
+        board.edited()
+
+        self.assertTrue(all(cell.model.owner == Energy.NEUTRAL for cell in board.cells.values()))
+        self.assertEqual(board.index.owned[Energy.P1], 0)
+        self.assertFalse(board.index.alive(Energy.P1))
+        self.assertFalse(board.index.cells[Energy.P1])
+        self.assertEqual(board.index.moves[Energy.NEUTRAL], len(board.cells))
+
+    def test_new_replay(self):
+        board = make_board(self.DATA)
+        board.resolve(0, 0)
+        replay = board.replay
+        board.seek(replay, 1)
+
+        board.cells.pop((1, 3)).delete()
+        board.edited()
+
+        self.assertIsNot(board.replay, replay)
+        self.assertEqual(len(board.replay), 0)
+        self.assertIsNone(board._seek)
+        with self.assertRaises(ValueError):
+            board.seek(replay, 1)
+
+        board.resolve(0, 3)
+        self.assertIn(0, board.replay.keyframes)
+
+
+class Elimination(unittest.TestCase):
+    PORT = MODEL_TYPE.index(MagicCellModel)
+    VOID = MODEL_TYPE.index(VoidCellModel)
+
+    @engines
+    def test_port_capture(self):
+        # У P2 только порт из двух теней, взрыв P1 заряжает вторую тень и забирает весь порт.
+        # Раньше проигравших искали по ходу заполнения: первая тень ещё показывала P2,
+        # и P2 доживал до следующей волны. Теперь счётчики индекса смотрят после волны
+        data = scheme([(0, 0), (0, 2), (1, 2), (1, 3), (3, 0), (3, 1)], [(0, 2, 0), (2, 3, 2), (4, 5, 2)],
+                      {(0, 2): self.PORT, (1, 2): self.PORT})
+        board = make_board(data)
+        for position, owner in (((0, 0), Energy.P1), ((3, 0), Energy.P1), ((0, 2), Energy.P2)):
+            board.cells[position].model.owner = owner
+        board.reindex()
+        board.rehash()
+        # Первый круг пройден, иммунитета ни у кого нет
+        board.players.next()
+        board.players.next()
+
+        result = board.resolve(0, 0)
+        self.assertEqual(result.waves, 1)
+        self.assertEqual(result.phase, GSA.FINISH)
+        self.assertEqual(board.players.queue(), [Energy.P1])
+        self.assertEqual(board.cells[(0, 2)].model.owner, Energy.P1)
+        self.assertFalse(board.index.alive(Energy.P2))
+
+
+    @engines
+    def test_first_move_loses(self):
+        # Первым ходом P1 взрывает клетку в пустоту и остаётся без клеток. Во время волны
+        # у него иммунитет, выбывает он после передачи хода
+        data = scheme([(0, 0), (0, 1), (3, 0), (3, 1)], [(0, 1, 0), (2, 3, 2)], {(0, 1): self.VOID})
+        for players in ((Energy.P1, Energy.P2, Energy.P3), (Energy.P1, Energy.P2)):
+            board = make_board(data, players)
+            result = board.resolve(0, 0)
+            self.assertEqual(board.cells[(0, 0)].model.owner, Energy.NEUTRAL)
+            self.assertEqual(board.players.queue(), list(players[1:]))
+            self.assertEqual(result.phase, GSA.WATING if len(players) > 2 else GSA.FINISH)
+
+
+class Snapshots(unittest.TestCase):
+    PORT = MODEL_TYPE.index(MagicCellModel)
+
+    @staticmethod
+    def state(board):
+        index = board.index
+        return ([(cell.model.owner_id, cell.model.power, cell.model.input_owner_id, cell.model.input_power)
+                 for cell in board.cells.values()],
+                board.players.snapshot(), board.phase(), board.zobrist,
+                +index.owned, +index.moves, set(index.free))
+
+    @engines
+    def test_round_trip(self):
+        rnd = random.Random(EngineMatchesModels.SEED)
+        board = make_board(EngineMatchesModels().data(self.PORT, rnd),
+                           EngineMatchesModels.PLAYERS)
+        # После хода P1 иммунитет остаётся только у P2 и P3
+        board.resolve(*EngineMatchesModels.choose(board, rnd))
+        snapshot = board.snapshot()
+        saved = self.state(board)
+
+        ports = {cell.model.origin for cell in board.cells.values() if isinstance(cell.model, MagicCellModel)}
+        owners = {port: port.owner_id for port in ports}
+        for _ in range(10):
+            if board.phase() != GSA.WATING:
+                break
+            board.resolve(*EngineMatchesModels.choose(board, rnd))
+        self.assertNotEqual(self.state(board), saved)
+        self.assertTrue(any(port.owner_id != owners[port] for port in ports))
+
+        board.restore(snapshot, render=False)
+        self.assertEqual(self.state(board), saved)
+        self.assertEqual({port: port.owner_id for port in ports}, owners)
+        self.assertEqual(board.zobrist, board.rehash())
+
+    def test_copy(self):
+        # Копия того же типа со своими связями и без индекса, тени порта остаются в общем порте
+        cells = [(0, 0), (0, 1), (1, 0)]
+        for tc, cls in enumerate(MODEL_TYPE):
+            with self.subTest(type=cls.__name__):
+                board = make_board(scheme(cells, [(0, 1, 2), (2, 0, 0)], {(0, 0): tc}))
+                model = board.cells[(0, 0)].model
+                model.input_power = 1
+                model.input_owner_id = Energy.P2.value
+                copy = model.copy()
+
+                self.assertIs(type(copy), cls)
+                self.assertIsNone(copy.index)
+                self.assertIs(model.index, board.index)
+                self.assertEqual((copy.position, copy.owner_id, copy.power, copy.lim),
+                                 (model.position, model.owner_id, model.power, model.lim))
+                self.assertEqual((copy.input_owner_id, copy.input_power), (Energy.P2.value, 1))
+                self.assertEqual(list(copy.outgoing_links), list(model.outgoing_links))
+                self.assertEqual(list(copy.incoming_links), list(model.incoming_links))
+                self.assertIsNot(copy.outgoing_links, model.outgoing_links)
+                if model.outgoing_links:
+                    copy.outgoing_links.pop(board.cells[(0, 1)].model)
+                    self.assertEqual(len(model.outgoing_links), len(copy.outgoing_links) + 1)
+                if isinstance(model, MagicCellModel):
+                    self.assertIs(copy.origin, model.origin)
+                    self.assertFalse(any(shadow is copy for shadow in model.origin.shadow))
+
+
+class PortsPerBoard(unittest.TestCase):
+    PORT = MODEL_TYPE.index(MagicCellModel)
+    # Порт из двух теней, в каждую ведёт своя клетка
+    DATA = scheme([(0, 0), (0, 1), (2, 0), (2, 1)], [(0, 1, 2), (2, 3, 2), (1, 3, 0)],
+                  {(0, 1): PORT, (2, 1): PORT})
+
+    @staticmethod
+    def origin(board):
+        return board.cells[(0, 1)].model.origin
+
+    def test_two_boards(self):
+        first, second = make_board(self.DATA), make_board(self.DATA)
+        self.assertIsNot(first.ports, second.ports)
+        self.assertIsNot(self.origin(first), self.origin(second))
+
+        first.resolve(0, 1)
+        self.assertEqual(self.origin(first).owner, Energy.P1)
+        self.assertEqual(first.cells[(2, 1)].model.owner, Energy.P1)
+        self.assertTrue(all(cell.model.owner == Energy.NEUTRAL for cell in second.cells.values()))
+
+    def test_restart(self):
+        # Перезапуск собирает доску заново, старые тени не остаются в порте
+        board = make_board(self.DATA)
+        board.resolve(0, 1)
+        board.restart(Modes.EXTENDED)
+        board.state.complete()
+        origin = self.origin(board)
+        self.assertEqual(len(board.ports.models), 1)
+        self.assertEqual([model.position for model in origin.shadow], [(0, 1), (2, 1)])
+        self.assertEqual((origin.owner, origin.power), (Energy.NEUTRAL, 0))
+
+    @engines
+    def test_bookkeeping(self):
+        # Предел порта - сумма исходящих связей теней, счётчик реакций обнуляется после волны
+        board = make_board(self.DATA)
+        origin = self.origin(board)
+        self.assertEqual(origin.lim, 3)
+        result = board.resolve(0, 1)
+        self.assertEqual(result.waves, 1)
+        self.assertEqual(origin.reacted, 0)
+        self.assertEqual((origin.owner, origin.power), (Energy.P1, 1))
+
+        board.cells.pop((2, 1)).delete()
+        self.assertEqual(origin.lim, 1)
+        self.assertEqual(len(origin.shadow), 1)
+
+
+class SaveLinks(unittest.TestCase):
+    def test_round_trip(self):
+        # Кратные связи в обе стороны, в одну сторону и петля переживают сохранение
+        data = scheme([(0, 0), (0, 1), (1, 0)],
+                      [(0, 1, 2), (0, 1, 2), (0, 1, 0), (1, 0, 0), (0, 2, 1), (2, 2, 0), (2, 2, 0)],
+                      {(1, 0): PortsPerBoard.PORT})
+        board = make_board(data)
+        saved = make_board(board.save())
+
+        def links(board):
+            return {position: (sorted((m.position, n) for m, n in cell.model.outgoing_links.items()),
+                               sorted((m.position, n) for m, n in cell.model.incoming_links.items()))
+                    for position, cell in board.cells.items()}
+        self.assertEqual(links(saved), links(board))
+        self.assertEqual(board.cells[(0, 0)].model.outgoing_links.count(board.cells[(0, 1)].model), 3)
+        self.assertEqual(board.cells[(0, 1)].model.outgoing_links.count(board.cells[(0, 0)].model), 3)
+        self.assertEqual(saved.cells[(1, 0)].model.lim, 3)
+
+
+class Resolve(unittest.TestCase):
+    LENGTH = 30
+
+    def chain(self):
+        # Цепочка клеток P1 с пределом 1, последняя отдаёт заряд в пустоту
+        length = self.LENGTH
+        cells = [(0, col) for col in range(length + 1)] + [(2, 0), (2, 1)]
+        links = [(i, i + 1, 0) for i in range(length)] + [(length + 1, length + 2, 2)]
+        board = make_board(scheme(cells, links, {(0, length): Elimination.VOID}))
+        for col in range(length):
+            board.cells[(0, col)].model.owner = Energy.P1
+        board.cells[(2, 0)].model.owner = Energy.P1
+        board.reindex()
+        board.rehash()
+        return board
+
+    def owners(self, board):
+        return [cell.model.owner for cell in board.cells.values()]
+
+    @engines
+    def test_cascade(self):
+        # Вся цепная реакция за один вызов, без видов клеток и без часов pyglet
+        board = self.chain()
+        self.assertTrue(all(cell.view is None for cell in board.cells.values()))
+        result = board.resolve(0, 1)
+        self.assertEqual(result.phase, GSA.WATING)
+        self.assertEqual(result.waves, self.LENGTH - 1)
+        self.assertIsNone(result.cycle)
+        self.assertEqual({cell.model.position for cell in result.touched},
+                         {(0, col) for col in range(1, self.LENGTH)})
+        self.assertTrue(all(board.cells[(0, col)].model.owner == Energy.NEUTRAL for col in range(1, self.LENGTH)))
+        self.assertEqual(board.players.current(), Energy.P2)
+
+    def test_impossible(self):
+        board = self.chain()
+        board.resolve(0, 1)
+        self.assertIsNone(board.resolve(0, 0))  # клетка P1, ходит P2
+        self.assertIsNone(board.resolve(5, 5))
+        self.assertEqual(board.players.current(), Energy.P2)
+
+    @engines
+    def test_max_waves(self):
+        # Прерванную реакцию досчитывает состояние доски, новый ход в это время невозможен
+        whole = self.chain()
+        whole.resolve(0, 1)
+        board = self.chain()
+        result = board.resolve(0, 1, max_waves=5)
+        self.assertEqual((result.phase, result.waves), (GSA.REACTION, 5))
+        self.assertIsNone(board.resolve(2, 1))
+
+        result = board.state.resolve()
+        self.assertEqual((result.phase, result.waves), (GSA.WATING, self.LENGTH - 1))
+        self.assertEqual(self.owners(board), self.owners(whole))
+        self.assertEqual(board.zobrist, whole.zobrist)
+
+
+class Replays(unittest.TestCase):
+    INTERVAL = 5
+    MOVES = 23
+
+    def record(self, tc=0):
+        rnd = random.Random(EngineMatchesModels.SEED + tc)
+        data = EngineMatchesModels().data(tc, rnd)
+        board = make_board(data, EngineMatchesModels.PLAYERS)
+        board.replay.interval = self.INTERVAL
+        positions = [board.position_hash()]
+        while board.phase() == GSA.WATING and len(board.replay) < self.MOVES:
+            board.resolve(*EngineMatchesModels.choose(board, rnd))
+            positions.append(board.position_hash())
+        return data, board, positions
+
+    def test_keyframes(self):
+        _, board, positions = self.record()
+        replay = board.replay
+        self.assertEqual(len(replay), self.MOVES)
+        self.assertEqual(len(positions), self.MOVES + 1)
+        self.assertEqual(sorted(replay.keyframes), list(range(0, self.MOVES, self.INTERVAL)))
+        self.assertEqual(replay.players, list(EngineMatchesModels.PLAYERS))
+
+    @engines
+    def test_seek(self):
+        # Перемотка на другой доске по записи, прошедшей через JSON, вперёд и назад
+        for tc in (0, Snapshots.PORT):
+            with self.subTest(tc=tc):
+                data, board, positions = self.record(tc)
+                replay = Replay.load(json.loads(json.dumps(board.replay.dump())))
+                viewer = make_board(data, EngineMatchesModels.PLAYERS)
+                for move in (self.MOVES, 0, 7, 8, 12, 3, 21, self.MOVES + 10):
+                    viewer.seek(replay, move)
+                    self.assertEqual(viewer.position_hash(), positions[min(move, self.MOVES)], move)
+
+    def test_seek_from_keyframe(self):
+        # С начала досчитываются только ходы после ближайшего ключевого кадра
+        data, board, positions = self.record()
+        viewer = make_board(data, EngineMatchesModels.PLAYERS)
+        moves = []
+        resolve = viewer.resolve
+        def counted(row, col, *args):
+            moves.append((row, col))
+            return resolve(row, col, *args)
+        viewer.resolve = counted
+
+        viewer.seek(board.replay, 18)
+        self.assertEqual(moves, board.replay.moves[15:18])
+        moves.clear()
+        viewer.seek(board.replay, 19)   # вперёд от прошлой перемотки
+        self.assertEqual(moves, board.replay.moves[18:19])
+        self.assertEqual(viewer.position_hash(), positions[19])
+
+    def test_other_map(self):
+        _, board, _ = self.record()
+        other = make_board(UnstableAfterEdit.DATA)
+        with self.assertRaises(ValueError):
+            other.seek(board.replay, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
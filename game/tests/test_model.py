@@ -0,0 +1,94 @@
+"""Проверки моделей клеток без доски. Запуск из корня проекта: python -m unittest discover game/tests"""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.TCGlogic.TCGModel import Energy, NEUTRAL, NO_OWNER, MODEL_TYPE, CellModel, Links, create_model
+
+
+class CompactModels(unittest.TestCase):
+    def test_slots(self):
+        for tc, cls in enumerate(MODEL_TYPE):
+            with self.subTest(type=cls.__name__):
+                model = create_model(tc, (0, 0))
+                self.assertFalse(hasattr(model, '__dict__'))
+                with self.assertRaises(AttributeError):
+                    model.extra = 1
+
+    def test_integer_owners(self):
+        # Внутри модели владельцы - числа, Energy только на входе и выходе
+        model, other = CellModel((0, 0)), CellModel((0, 1))
+        model.link(other)
+        self.assertEqual((model.owner_id, model.input_owner_id), (NEUTRAL, NO_OWNER))
+        self.assertIs(model.owner, Energy.NEUTRAL)
+        self.assertIsNone(model.input_owner)
+
+        model.owner = Energy.P2
+        model.power = 1
+        self.assertIs(type(model.owner_id), int)
+        self.assertEqual(model.owner_id, Energy.P2.value)
+
+        model.reaction()
+        self.assertEqual(other.input_owner_id, Energy.P2.value)
+        self.assertIs(other.input_owner, Energy.P2)
+        other.fill()
+        self.assertIs(other.owner, Energy.P2)
+        self.assertEqual((other.power, other.input_power, other.input_owner_id), (1, 0, NO_OWNER))
+
+    def test_cached_lim(self):
+        # Предел хранится в модели, link, unlink и delete соседа его пересчитывают
+        hub, a, b = CellModel((0, 0)), CellModel((0, 1)), CellModel((1, 0))
+        hub.link(a)
+        hub.link(a)
+        hub.link(b)
+        self.assertEqual((hub.lim, hub.lim_power()), (3, 3))
+        hub.unlink(a)
+        self.assertEqual(hub.lim, 2)
+        b.delete()
+        self.assertEqual(hub.lim, 1)
+        hub.owner = Energy.P1
+        hub.power = 1
+        self.assertTrue(hub.is_full())
+
+
+class LinkCounts(unittest.TestCase):
+    def test_multiplicity(self):
+        a, b, c = CellModel((0, 0)), CellModel((0, 1)), CellModel((1, 0))
+        links = Links([b, c, b])
+        self.assertEqual((len(links), links.count(b), links.count(c)), (3, 2, 1))
+        self.assertEqual(list(links), [b, b, c])
+        self.assertEqual(list(links.cells()), [b, c])
+        self.assertNotIn(a, links)
+
+        links.remove(b)
+        self.assertEqual(list(links), [b, c])
+        with self.assertRaises(ValueError):
+            links.remove(c, 2)
+        self.assertEqual(links.pop(c), 1)
+        self.assertEqual(links.pop(c), 0)
+        self.assertEqual((list(links), len(links)), ([b], 1))
+
+        copy = links.copy()
+        copy.add(a)
+        self.assertEqual(list(links), [b])
+        self.assertEqual(list(copy), [b, a])
+
+    def test_link_unlink(self):
+        # Обе стороны связи хранят одну кратность, unlink(count=None) снимает все связи
+        a, b = CellModel((0, 0)), CellModel((0, 1))
+        for _ in range(3):
+            a.link(b)
+        b.link(a)
+        self.assertEqual((a.outgoing_links.count(b), b.incoming_links.count(a)), (3, 3))
+        a.unlink(b)
+        self.assertEqual((a.outgoing_links.count(b), b.incoming_links.count(a), a.lim), (2, 2, 2))
+        a.unlink(b, None)
+        self.assertNotIn(b, a.outgoing_links)
+        self.assertNotIn(a, b.incoming_links)
+        self.assertEqual((a.lim, b.lim), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()